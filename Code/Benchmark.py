@@ -0,0 +1,395 @@
+""" Benchmarks for the performance critical parts of the stock screener
+
+Run from the repository root with 'python Code/Benchmark.py'.
+"""
+import itertools
+import numpy as np
+import pandas as pd
+import pickle
+import tempfile
+import time
+
+from urllib.parse import urlsplit
+
+from DataCommon import (apply_stocklist_schema, cell_contains, cell_greater_than, cell_less_than, cell_is_not_nan,
+                        cell_string_equals, cell_string_not_equals, get_stock, index_on_symbol, merge_updated_stocks)
+from DeltaLog import DeltaLog
+from FilterPipeline import FilterPipeline
+from HistoryStore import HistoryStore
+from SharedSnapshot import SnapshotPublisher, attach_snapshot, copy_snapshot
+from SortCache import SortCache
+from Definitions import *
+from StocklistStorage import STOCKLIST_STORAGE_BACKENDS
+from TableParser import TABLE_PARSER_BACKENDS, parse_table
+
+
+BENCHMARK_REPETITIONS = 5
+
+
+def time_function(function, *args, **kwargs) -> float:
+    """ Return the best time in seconds out of BENCHMARK_REPETITIONS calls """
+
+    best_time = float("inf")
+    for _ in range(BENCHMARK_REPETITIONS):
+        start_time = time.perf_counter()
+        function(*args, **kwargs)
+        best_time = min(best_time, time.perf_counter() - start_time)
+
+    return best_time
+
+
+def benchmark_table_parsers() -> None:
+    """ Compare the table parser backends on the pages recorded in the page cache """
+
+    parse_options = {"www.tradefollowers.com": {"columns": [0, 2, 3, 4], "cell_class": "datalistcolumn"},
+                     "www.sentdex.com": {"columns": [0, 2, 3], "markers": {4: "glyphicon-chevron-up"}}}
+
+    total_times = {backend: 0.0 for backend in TABLE_PARSER_BACKENDS}
+    num_pages = 0
+    for page_path in HTTP_CACHE_FOLDER.glob("*.pkl"):
+        with open(page_path, "rb") as page_file:
+            entry = pickle.load(page_file)
+
+        options = parse_options.get(urlsplit(entry["url"]).netloc)
+        if options is None:
+            continue
+
+        num_pages += 1
+        results = {}
+        for backend in TABLE_PARSER_BACKENDS:
+            results[backend] = parse_table(entry["text"], backend=backend, **options)
+            total_times[backend] += time_function(parse_table, entry["text"], backend=backend, **options)
+
+        if any(result != results["bs4"] for result in results.values()):
+            print("Backends disagree on {}".format(entry["url"]))
+
+    print("Parsed {} recorded pages:".format(num_pages))
+    for backend, total_time in total_times.items():
+        print("    {:<10} {:8.1f} ms".format(backend, 1000 * total_time))
+
+
+def create_stocklist(num_stocks: int) -> pd.DataFrame:
+    """ Create a stocklist with random data that has the same columns as the real one """
+
+    random = np.random.default_rng(0)
+    stock_df = pd.DataFrame({"Symbol": ["S{}".format(i) for i in range(num_stocks)],
+                             "Name": ["Stock {}".format(i) for i in range(num_stocks)],
+                             "Volume": random.integers(0, 10 ** 8, num_stocks).astype(float),
+                             "Sector": random.choice(["Technology", "Finance", "Energy"], num_stocks),
+                             "Twit_1d_Mom": np.nan,
+                             "Twit_7d_Mom": np.nan,
+                             "Updated": False})
+
+    return stock_df
+
+
+def merge_updated_stocks_with_iterrows(stock_df: pd.DataFrame, updated_stock_df: pd.DataFrame) -> pd.DataFrame:
+    """ The previous implementation of merge_updated_stocks, kept for comparison """
+
+    for i, stock in updated_stock_df.iterrows():
+        cols_with_values = stock.dropna()
+        row_index = stock_df.index[stock_df["Symbol"] == stock["Symbol"]]
+        for col, val in cols_with_values.items():
+            if col != "Symbol":
+                stock_df.loc[row_index, col] = val
+
+    return stock_df
+
+
+def benchmark_update_merge() -> None:
+    """ Time merging a batch of updated stocks into stocklists of increasing size """
+
+    print("Merging {} updated stocks:".format(ENOUGH_STOCKS_UPDATED_TO_SIGNAL))
+    print("    {:>8} {:>12} {:>12}".format("Stocks", "Vectorized", "Iterrows"))
+    for num_stocks in [1000, 10000, 100000]:
+        stock_df = index_on_symbol(create_stocklist(num_stocks))
+        symbols = stock_df["Symbol"].sample(ENOUGH_STOCKS_UPDATED_TO_SIGNAL, random_state=0)
+        updated_stock_df = pd.DataFrame({"Symbol": symbols.values,
+                                         "Name": "Updated name",
+                                         "Twit_1d_Mom": 1.0,
+                                         "Twit_7d_Mom": 7.0,
+                                         "Updated": True})
+
+        vectorized_time = time_function(merge_updated_stocks, stock_df, updated_stock_df)
+        iterrows_time = time_function(merge_updated_stocks_with_iterrows, stock_df, updated_stock_df)
+        print("    {:>8} {:>9.2f} ms {:>9.2f} ms".format(num_stocks, 1000 * vectorized_time, 1000 * iterrows_time))
+
+
+def benchmark_stocklist_storage() -> None:
+    """ Compare the storage backends, reading every column and only the columns needed for a history plot """
+
+    history_columns = ["Symbol", "Volume", "Twit_1d_Mom", "Twit_7d_Mom"]
+    pickle_storage = STOCKLIST_STORAGE_BACKENDS["pickle"]()
+    day_folders = [folder for folder in DATA_FOLDER.iterdir() if folder.is_dir() and pickle_storage.exists(folder)]
+    stocklists = {"{} day folders".format(len(day_folders)): [pickle_storage.read(folder) for folder in day_folders],
+                  "100000 stocks": [create_stocklist(100000)]}
+
+    print("Reading stocklists:")
+    print("    {:<18} {:<10} {:>10} {:>12} {:>12}".format("Stocklists", "Backend", "Bytes", "All columns",
+                                                          "{} columns".format(len(history_columns))))
+    with tempfile.TemporaryDirectory() as temp_folder:
+        for description, stock_dfs in stocklists.items():
+            for name, backend in STOCKLIST_STORAGE_BACKENDS.items():
+                storage = backend()
+                folders = []
+                for i, stock_df in enumerate(stock_dfs):
+                    folder = Path.joinpath(Path(temp_folder), name, "{}_{}".format(len(stock_dfs), i))
+                    folder.mkdir(parents=True)
+                    storage.write(stock_df, folder)
+                    folders.append(folder)
+
+                size = sum(storage.get_stocklist_path(folder).stat().st_size for folder in folders)
+                read_time = time_function(lambda: [storage.read(folder) for folder in folders])
+                history_time = time_function(lambda: [storage.read(folder, history_columns) for folder in folders])
+                print("    {:<18} {:<10} {:>10} {:>9.1f} ms {:>9.1f} ms".format(description, name, size,
+                                                                             1000 * read_time, 1000 * history_time))
+
+
+def benchmark_update_writes() -> None:
+    """ Compare the bytes written when storing 100 updates by rewriting the stocklist and by using the delta log """
+
+    num_updates = 100
+    stock_df = index_on_symbol(create_stocklist(1000))
+    storage = STOCKLIST_STORAGE_BACKENDS[STOCKLIST_STORAGE_BACKEND]()
+    updates = []
+    for i in range(num_updates):
+        symbols = stock_df["Symbol"].sample(ENOUGH_STOCKS_UPDATED_TO_SIGNAL, random_state=i)
+        updates.append(pd.DataFrame({"Symbol": symbols.values, "Name": "Updated name", "Twit_1d_Mom": 1.0,
+                                     "Twit_7d_Mom": 7.0, "Updated": True}))
+
+    print("Storing {} updates of {} stocks in a stocklist with {} stocks:".format(num_updates,
+                                                                                  ENOUGH_STOCKS_UPDATED_TO_SIGNAL,
+                                                                                  len(stock_df.index)))
+    with tempfile.TemporaryDirectory() as temp_folder:
+        folder = Path(temp_folder)
+        start_time = time.perf_counter()
+        bytes_written = 0
+        for updated_stock_df in updates:
+            stock_df = merge_updated_stocks(stock_df, updated_stock_df)
+            storage.write(stock_df, folder)
+            bytes_written += storage.get_stocklist_path(folder).stat().st_size
+        print("    Rewrite stocklist {:>10} bytes {:>9.1f} ms".format(bytes_written,
+                                                                     1000 * (time.perf_counter() - start_time)))
+
+        delta_log = DeltaLog(storage.get_delta_log_path(folder))
+        start_time = time.perf_counter()
+        for updated_stock_df in updates:
+            delta_log.append(updated_stock_df)
+        print("    Delta log          {:>10} bytes {:>9.1f} ms".format(delta_log.path.stat().st_size,
+                                                                     1000 * (time.perf_counter() - start_time)))
+
+
+def benchmark_snapshot_handoff() -> None:
+    """ Compare getting the complete stocklist from disk and from the snapshot in shared memory """
+
+    print("Loading the stocklist in the DataInterface:")
+    print("    {:>8} {:>12} {:>12} {:>12}".format("Stocks", "Disk", "Snapshot", "Attach"))
+    storage = STOCKLIST_STORAGE_BACKENDS[STOCKLIST_STORAGE_BACKEND]()
+    for num_stocks in [1000, 10000, 100000]:
+        stock_df = create_stocklist(num_stocks)
+        snapshot_directory = {}
+        snapshot_publisher = SnapshotPublisher(snapshot_directory)
+        snapshot_publisher.publish(stock_df, 0)
+        with tempfile.TemporaryDirectory() as temp_folder:
+            storage.write(stock_df, Path(temp_folder))
+            disk_time = time_function(lambda: index_on_symbol(storage.read(Path(temp_folder))))
+
+        snapshot_time = time_function(lambda: index_on_symbol(copy_snapshot(snapshot_directory)[0]))
+        # Only attaching the block, the lower bound for a reader that doesn't copy the stocklist
+        attach_time = time_function(lambda: attach_snapshot(snapshot_directory).close())
+        snapshot_publisher.release(snapshot_publisher.shared_memory)
+        print("    {:>8} {:>9.2f} ms {:>9.2f} ms {:>9.2f} ms".format(num_stocks, 1000 * disk_time, 1000 * snapshot_time,
+                                                                   1000 * attach_time))
+
+
+def benchmark_history_query() -> None:
+    """ Compare getting the history of one stock by reading every day folder and from the history store """
+
+    num_days = 20
+    history_columns = ["Symbol", "Volume", "Twit_1d_Mom", "Twit_7d_Mom"]
+    storage = STOCKLIST_STORAGE_BACKENDS[STOCKLIST_STORAGE_BACKEND]()
+
+    print("Getting the history of a stock over {} days:".format(num_days))
+    print("    {:>8} {:>12} {:>12}".format("Stocks", "Day folders", "History"))
+    for num_stocks in [1000, 10000, 100000]:
+        stock_df = create_stocklist(num_stocks)
+        with tempfile.TemporaryDirectory() as temp_folder:
+            history = HistoryStore(Path.joinpath(Path(temp_folder), "History"))
+            folders = []
+            for day in range(num_days):
+                folder = Path.joinpath(Path(temp_folder), "Day{:02d}".format(day))
+                folder.mkdir()
+                history.add_day(folder.name, stock_df, storage.write(stock_df, folder)["version"])
+                folders.append(folder)
+
+            symbol = stock_df["Symbol"].iloc[num_stocks // 2]
+            folder_time = time_function(lambda: [get_stock(index_on_symbol(storage.read(folder, history_columns)),
+                                                           symbol) for folder in folders])
+            history_time = time_function(history.get_history, symbol, history_columns)
+
+        print("    {:>8} {:>9.1f} ms {:>9.1f} ms".format(num_stocks, 1000 * folder_time, 1000 * history_time))
+
+
+def benchmark_history_refresh() -> None:
+    """ Compare ways of adding a new day to the cached histories of 100 stocks that cover the 20 days before it """
+
+    num_days = 20
+    num_cached = 100
+    history_columns = ["Symbol", "Volume", "Twit_1d_Mom", "Twit_7d_Mom"]
+    stock_df = create_stocklist(10000)
+    symbols = stock_df["Symbol"].sample(num_cached, random_state=0).tolist()
+
+    print("Adding a day to {} cached histories of {} days, {} stocks per day:".format(num_cached, num_days,
+                                                                                    len(stock_df.index)))
+    with tempfile.TemporaryDirectory() as temp_folder:
+        history = HistoryStore(Path(temp_folder))
+        for day in range(num_days + 1):
+            history.add_day("Day{:02d}".format(day), stock_df, 1)
+        new_day = "Day{:02d}".format(num_days)
+
+        rebuild_time = time_function(lambda: [history.get_history(symbol, history_columns) for symbol in symbols])
+        append_time = time_function(lambda: [history.get_history(symbol, history_columns, [new_day])
+                                             for symbol in symbols])
+        bulk_time = time_function(lambda: index_on_symbol(history.read_day(new_day, history_columns)).reindex(symbols))
+
+    print("    Rebuild every history     {:>9.1f} ms".format(1000 * rebuild_time))
+    print("    Append the day per stock  {:>9.1f} ms".format(1000 * append_time))
+    print("    Bulk refresh              {:>9.1f} ms".format(1000 * bulk_time))
+
+
+def filter_stocklist_step_by_step(stock_df: pd.DataFrame, filters: list) -> pd.DataFrame:
+    """ The previous implementation of DataInterface.perform_filtering, the reference in the benchmark and the tests """
+
+    filtered_stock_df = stock_df.copy()
+    for filter in filters:
+        rows_to_keep = filter["func"](filtered_stock_df[filter["column"]], filter["val"])
+        filtered_stock_df = filtered_stock_df[rows_to_keep]
+
+    return filtered_stock_df
+
+
+def create_filters() -> list:
+    """ Create ten filters of the kinds that can be chosen in the GUI """
+
+    filters = [{"column": "Volume", "func": cell_greater_than, "val": 1000.0 * i} for i in range(4)]
+    filters += [{"column": "Volume", "func": cell_less_than, "val": 10.0 ** 8 - 1000.0 * i} for i in range(3)]
+    filters += [{"column": "Volume", "func": cell_is_not_nan, "val": None},
+                {"column": "Sector", "func": cell_string_not_equals, "val": "Energy"},
+                {"column": "Name", "func": cell_contains, "val": "1"}]
+
+    return [dict(filter, label=str(i)) for i, filter in enumerate(filters)]
+
+
+def benchmark_filtering() -> None:
+    """ Compare applying ten filters one at a time and with the FilterPipeline, and changing one filter """
+
+    filters = create_filters()
+    print("Applying {} filters:".format(len(filters)))
+    print("    {:>8} {:>12} {:>12} {:>12} {:>12}".format("Stocks", "Step by step", "Pipeline", "Add filter",
+                                                         "Remove filter"))
+    for num_stocks in [1000, 10000, 100000]:
+        stock_df = index_on_symbol(create_stocklist(num_stocks))
+        step_time = time_function(filter_stocklist_step_by_step, stock_df, filters)
+        # The TextIndex of the pipeline is kept between data versions, so it is built before timing
+        filter_pipeline = FilterPipeline()
+        data_versions = itertools.count()
+        pipeline_time = time_function(lambda: filter_pipeline.apply(stock_df, filters, next(data_versions)))
+
+        # The pipeline has cached the masks of the other filters when the user changes one
+        filter_pipeline = FilterPipeline()
+        filter_pipeline.apply(stock_df, filters)
+        new_filter = {"column": "Volume", "func": cell_greater_than, "val": 5.0, "label": "new"}
+        add_time = time_function(lambda: [filter_pipeline.apply(stock_df, filters + [new_filter]),
+                                          filter_pipeline.masks.popitem()])
+        remove_time = time_function(filter_pipeline.apply, stock_df, filters[1:])
+
+        print("    {:>8} {:>9.2f} ms {:>9.2f} ms {:>9.2f} ms {:>9.2f} ms".format(num_stocks, 1000 * step_time,
+                                                                               1000 * pipeline_time, 1000 * add_time,
+                                                                               1000 * remove_time))
+
+
+def benchmark_sorting() -> None:
+    """ Compare sorting the working stocklist and a filtered subset of it with sort_values and the SortCache """
+
+    print("Sorting:")
+    print("    {:>8} {:<8} {:>12} {:>12} {:>12} {:>12}".format("Stocks", "Column", "sort_values", "First sort",
+                                                               "New subset", "Repeated"))
+    for num_stocks in [1000, 10000, 100000]:
+        stock_df = index_on_symbol(create_stocklist(num_stocks))
+        filtered_stock_df = FilterPipeline().apply(stock_df, create_filters()[:3])
+        for column in ["Volume", "Sector", "Name"]:
+            sort_values_time = time_function(stock_df.sort_values, by=[column], ascending=False)
+            first_time = time_function(lambda: SortCache().sort(stock_df, stock_df, column, False))
+
+            sort_cache = SortCache()
+            sort_cache.sort(stock_df, stock_df, column, False)
+            # A new filtered stocklist every call, only the permutation of the working stocklist is cached
+            subset_time = time_function(lambda: sort_cache.sort(filtered_stock_df[:], stock_df, column, False))
+            repeated_time = time_function(sort_cache.sort, stock_df, stock_df, column, False)
+            print("    {:>8} {:<8} {:>9.2f} ms {:>9.2f} ms {:>9.2f} ms {:>9.2f} ms".format(
+                num_stocks, column, 1000 * sort_values_time, 1000 * first_time, 1000 * subset_time,
+                1000 * repeated_time))
+
+
+def benchmark_text_search() -> None:
+    """ Compare searching the names with a regular expression and with the TextIndex of the FilterPipeline """
+
+    print("Searching the names:")
+    print("    {:>8} {:<10} {:>12} {:>12} {:>12} {:>12}".format("Stocks", "Search", "Regex", "Build index",
+                                                               "New version", "Indexed"))
+    for num_stocks in [1000, 10000, 100000]:
+        stock_df = index_on_symbol(create_stocklist(num_stocks))
+        for search_string in ["stock 1", "ock 987"]:
+            filters = [{"column": "Name", "func": cell_contains, "val": search_string, "label": "search"}]
+            regex_time = time_function(cell_contains, stock_df["Name"], search_string)
+            build_time = time_function(lambda: FilterPipeline().apply(stock_df, filters))
+
+            # The TextIndex is kept when the data is updated, only the rows are mapped to its texts again
+            filter_pipeline = FilterPipeline()
+            data_versions = itertools.count()
+            version_time = time_function(lambda: filter_pipeline.apply(stock_df, filters, next(data_versions)))
+            search_time = time_function(lambda: [filter_pipeline.masks.clear(),
+                                                 filter_pipeline.apply(stock_df, filters, -1)])
+            print("    {:>8} {:<10} {:>9.2f} ms {:>9.2f} ms {:>9.2f} ms {:>9.2f} ms".format(
+                num_stocks, search_string, 1000 * regex_time, 1000 * build_time, 1000 * version_time,
+                1000 * search_time))
+
+
+def benchmark_stocklist_schema() -> None:
+    """ Compare the memory, merging, filtering and sorting of a stocklist with and without the dtypes of the schema """
+
+    print("Stocklist dtypes:")
+    print("    {:>8} {:<8} {:>12} {:>12} {:>12} {:>12}".format("Stocks", "Dtypes", "Bytes/row", "Merge", "Filter",
+                                                               "Sort"))
+    for num_stocks in [1000, 10000, 100000]:
+        stock_df = index_on_symbol(create_stocklist(num_stocks))
+        random = np.random.default_rng(1)
+        stock_df["Industry"] = random.choice(["Industry {}".format(i) for i in range(150)], num_stocks)
+        stock_df["Avg Vol (3 month)"] = random.integers(0, 10 ** 8, num_stocks).astype(float)
+        stock_df["Direction"] = random.choice(["up", "down"], num_stocks)
+        filters = [{"column": "Sector", "func": cell_string_equals, "val": "Finance", "label": "sector"},
+                   {"column": "Volume", "func": cell_greater_than, "val": 10 ** 6, "label": "volume"}]
+        updated_stock_df = stock_df.iloc[::100][["Symbol", "Industry", "Volume"]].reset_index(drop=True)
+        updated_stock_df["Industry"] = "New industry"
+
+        for dtypes, df in [("object", stock_df), ("schema", apply_stocklist_schema(stock_df.copy()))]:
+            bytes_per_row = df.memory_usage(index=False, deep=True).sum() / num_stocks
+            merge_time = time_function(lambda: merge_updated_stocks(df.copy(), updated_stock_df))
+            filter_time = time_function(lambda: FilterPipeline().apply(df, filters))
+            sort_time = time_function(lambda: SortCache().sort(df, df, "Industry", True))
+            print("    {:>8} {:<8} {:>12.1f} {:>9.2f} ms {:>9.2f} ms {:>9.2f} ms".format(
+                num_stocks, dtypes, bytes_per_row, 1000 * merge_time, 1000 * filter_time, 1000 * sort_time))
+
+
+if __name__ == "__main__":
+    benchmark_table_parsers()
+    benchmark_update_merge()
+    benchmark_stocklist_storage()
+    benchmark_update_writes()
+    benchmark_snapshot_handoff()
+    benchmark_history_query()
+    benchmark_history_refresh()
+    benchmark_filtering()
+    benchmark_sorting()
+    benchmark_text_search()
+    benchmark_stocklist_schema()
@@ -1,27 +1,55 @@
 import multiprocessing as mp
 import numpy as np
 import pandas as pd
-import requests
 
 from bs4 import BeautifulSoup
 from pandas.core.reshape.merge import merge
 from pathlib import Path
 
+from DeltaLog import DeltaLog
 from Definitions import *
+from HistoryStore import HISTORY_STORE_AVAILABLE, HistoryStore
+from StockHistoryCache import StockHistoryCache, append_days, get_missing_days
+from StocklistStorage import get_stocklist_storage
+from SymbolNameStore import SymbolNameStore
+from WebSession import get_web_session
 
 
 class DataCommon():
     def __init__(self, lock: mp.Lock, queue: mp.Queue) -> None:
         self.lock = lock
         self.queue = queue
+        self.web_session = get_web_session()
+        self.symbol_names = SymbolNameStore()
+        self.storage = get_stocklist_storage()
+        self.delta_log = DeltaLog(self.storage.get_delta_log_path(CURRENT_DATA_FOLDER))
+        self.history = HistoryStore() if HISTORY_STORE_AVAILABLE else None
+        self.history_cache = StockHistoryCache()
 
 
-    def read_data(self) -> pd.DataFrame:
-        """ To use this function the user must first acquire the file lock """
+    def read_data(self, columns: list = None) -> pd.DataFrame:
+        """ Read the stocklist of the current day
+
+        Description
+        -----------
+        The stocklist is returned indexed on symbol, with the updates in the delta log applied. Reading doesn't
+        require the file lock, see 'read_stocklist'.
+
+        Parameters
+        ----------
+        columns : list
+            Optional, only these columns are read
+
+        Returns
+        -------
+        pandas.DataFrame
+            The stocklist, an empty dataframe if it couldn't be read
+
+        """
         stock_df = pd.DataFrame()
         try:
             print("{} Reading data...".format(DATA_COMMON_MESSAGE_HEADER))
-            stock_df = pd.read_pickle(Path.joinpath(CURRENT_DATA_FOLDER, "{}.pkl".format(STOCKLIST_PICKLE_FILE)))
+            stock_df = self.read_stocklist(CURRENT_DATA_FOLDER, columns)
             print("{} Finished reading data...".format(DATA_COMMON_MESSAGE_HEADER))
         except Exception as e:
             print("{} Failed to read data, got {}".format(DATA_COMMON_MESSAGE_HEADER, e))
@@ -29,37 +57,269 @@ class DataCommon():
         return stock_df
 
 
+    def read_stocklist(self, folder: Path, columns: list = None) -> pd.DataFrame:
+        """ Read the stocklist of a day folder and apply its delta log
+
+        Description
+        -----------
+        The stocklist and the delta log are taken from the same manifest, so they always belong together. If a newer
+        version is written while reading, the files of the version being read can be removed before they have been
+        opened, in which case the manifest is read again. An exception is raised if the stocklist can't be read.
+
+        Parameters
+        ----------
+        folder : pathlib.Path
+            The day folder to read from
+        columns : list
+            Optional, only these columns are read
+
+        Returns
+        -------
+        pandas.DataFrame
+            The stocklist
+
+        """
+
+        for attempt in range(STOCKLIST_READ_ATTEMPTS):
+            manifest = self.storage.read_manifest(folder)
+            try:
+                stock_df = index_on_symbol(self.storage.read(folder, columns, manifest))
+                deltas = DeltaLog(self.storage.get_delta_log_path(folder, manifest)).read(columns)
+                break
+            except FileNotFoundError:
+                if attempt == STOCKLIST_READ_ATTEMPTS - 1:
+                    raise
+
+        if not deltas.empty:
+            stock_df = merge_updated_stocks(stock_df, deltas)
+
+        # Stocklists written before the schema was introduced get their dtypes here
+        return apply_stocklist_schema(stock_df)
+
+
     def write_data(self, stock_df: pd.DataFrame) -> None:
+        """ Write a new version of the stocklist of the current day, which starts with an empty delta log
+
+        To use this function the user must first acquire the file lock.
+        """
+
         try:
             print("{} Writing data...".format(DATA_COMMON_MESSAGE_HEADER))
-            stock_df.to_pickle(Path.joinpath(CURRENT_DATA_FOLDER, "{}.pkl".format(STOCKLIST_PICKLE_FILE)))
+            self.write_stocklist(stock_df, CURRENT_DATA_FOLDER)
             print("{} Finished writing data...".format(DATA_COMMON_MESSAGE_HEADER))
         except Exception as e:
             print("{} Failed to write data, got {}".format(DATA_COMMON_MESSAGE_HEADER, e))
 
 
-    def update_data(self, updated_stock_df: pd.DataFrame) -> None:
+    def write_stocklist(self, stock_df: pd.DataFrame, folder: Path) -> None:
+        manifest = self.storage.write(stock_df, folder)
+        if folder == CURRENT_DATA_FOLDER:
+            self.delta_log = DeltaLog(self.storage.get_delta_log_path(folder, manifest))
+
+        if self.history is not None:
+            self.history.add_day(folder.name, stock_df, manifest["version"])
+
+
+    def update_history(self, folder: Path) -> None:
+        """ Add the stocklist of a day folder to the history store, unless its current version is already there
+
+        To use this function the user must first acquire the file lock.
+        """
+
+        if self.history is None:
+            return
+
+        manifest = self.storage.read_manifest(folder)
+        if (manifest["version"] is None or not self.storage.get_stocklist_path(folder, manifest).exists() or
+                self.history.get_version(folder.name) == manifest["version"]):
+            return
+
         try:
-            stock_df = self.read_data()
+            print("{} Adding the stocklist in {} to the history...".format(DATA_COMMON_MESSAGE_HEADER, folder))
+            self.history.add_day(folder.name, self.read_stocklist(folder), manifest["version"])
+        except Exception as e:
+            print("{} Failed to add the stocklist in {} to the history, got {}".format(DATA_COMMON_MESSAGE_HEADER,
+                                                                                       folder, e))
 
-            for i, stock in updated_stock_df.iterrows():
-                cols_with_values = stock.dropna()
-                row_index = stock_df.index[stock_df["Symbol"] == stock["Symbol"]]
-                for col, val in cols_with_values.iteritems():
-                    if col != "Symbol":
-                        stock_df.loc[row_index, col] = val
 
-            self.write_data(stock_df)
+    def update_data(self, updated_stock_df: pd.DataFrame) -> None:
+        """ Store updated stocks in the delta log of the current day, and compact the log if it's time to
+
+        To use this function the user must first acquire the file lock.
+        """
+
+        try:
+            self.delta_log.append(updated_stock_df)
+            if self.delta_log.needs_compaction():
+                self.compact_data(CURRENT_DATA_FOLDER)
         except Exception as e:
             print("{} Failed to update data, got {}".format(DATA_COMMON_MESSAGE_HEADER, e))
 
 
+    def compact_data(self, folder: Path) -> None:
+        """ Fold the delta log of a day folder into a new version of its stocklist
+
+        Description
+        -----------
+        Folders without a manifest are given one, which moves stocklists stored the old way over to the configured
+        storage backend. Readers are never blocked, they keep reading the previous version until the manifest of the
+        new one is in place. To use this function the user must first acquire the file lock.
+
+        Parameters
+        ----------
+        folder : pathlib.Path
+            The day folder to compact
+
+        """
+
+        manifest = self.storage.read_manifest(folder)
+        if not self.storage.get_stocklist_path(folder, manifest).exists():
+            return
+
+        if manifest["version"] is not None and not DeltaLog(self.storage.get_delta_log_path(folder, manifest)).exists():
+            return
+
+        try:
+            print("{} Compacting the stocklist in {}...".format(DATA_COMMON_MESSAGE_HEADER, folder))
+            self.write_stocklist(self.read_stocklist(folder), folder)
+        except Exception as e:
+            print("{} Failed to compact the stocklist in {}, got {}".format(DATA_COMMON_MESSAGE_HEADER, folder, e))
+
+
+    def get_history_days(self) -> list:
+        """ Get the dates of all days before the current one that have a stocklist """
+
+        if self.history is not None:
+            days = list(self.history.read_index())
+        else:
+            days = [folder.name for folder in DATA_FOLDER.iterdir() if folder.is_dir() and self.storage.exists(folder)]
+
+        return [day for day in days if day != CURRENT_DATA_FOLDER.name]
+
+
+    def read_history_day(self, day: str, columns: list = None) -> pd.DataFrame:
+        """ Read the stocklist of a day indexed on symbol, from the history store if there is one """
+
+        stock_df = self.history.read_day(day, columns) if self.history is not None else None
+        if stock_df is None:
+            stock_df = self.read_stocklist(Path.joinpath(DATA_FOLDER, day), columns)
+
+        return index_on_symbol(stock_df)
+
+
+    def read_stock_history(self, symbol: str, columns: list, days: list) -> pd.DataFrame:
+        """ Get the rows of a stock on the given days, indexed on date
+
+        Parameters
+        ----------
+        symbol : str
+            Ticker symbol for the stock
+        columns : list
+            The columns to read
+        days : list
+            The dates of the days to read
+
+        Returns
+        -------
+        pandas.DataFrame
+            One row per day that the stock exists in
+
+        """
+
+        if self.history is not None:
+            # Only the rows of the stock are read from the history store
+            return self.history.get_history(symbol, columns, days)
+
+        stock_history = pd.DataFrame(columns=columns)
+        for day in days:
+            old_stock = get_stock(self.read_history_day(day, columns), symbol)
+            if old_stock is not None:
+                stock_history.loc[day] = old_stock
+
+        return stock_history
+
+
+    def refresh_stock_histories(self) -> None:
+        """ Append the days that have been added since the cached stock histories were written
+
+        Description
+        -----------
+        Every new day is read once and the rows of all cached stocks that are missing it are taken from it, instead
+        of looking the day up once per stock. The row of the current day is added when a history is shown, see
+        'DataInterface.get_stock_data_over_time'.
+
+        """
+
+        try:
+            caches = {}
+            for symbol in self.history_cache.get_symbols():
+                stock_history, covered_dates = self.history_cache.read(symbol)
+                if stock_history is not None:
+                    caches[symbol] = (stock_history, covered_dates)
+
+            days = self.get_history_days()
+            missing_days = {symbol: get_missing_days(covered_dates, days)
+                            for symbol, (_, covered_dates) in caches.items()}
+            new_days = sorted(set(day for symbol_days in missing_days.values() for day in symbol_days))
+            if not new_days:
+                return
+
+            print("{} Adding {} days to {} stock histories...".format(DATA_COMMON_MESSAGE_HEADER, len(new_days),
+                                                                       len(caches)))
+            columns = sorted(set(col for stock_history, _ in caches.values() for col in stock_history.columns) |
+                             {"Symbol"})
+            found_stocks = []
+            for day in new_days:
+                stock_df = self.read_history_day(day, columns)
+                symbols = [symbol for symbol, symbol_days in missing_days.items() if day in symbol_days]
+                day_stocks = stock_df.reindex(symbols).dropna(subset=["Symbol"])
+                found_stocks.append(day_stocks.set_index(pd.Index([day] * len(day_stocks.index))))
+            found_stocks = dict(tuple(pd.concat(found_stocks).groupby("Symbol", sort=False)))
+
+            for symbol, (stock_history, covered_dates) in caches.items():
+                if missing_days[symbol]:
+                    new_rows = found_stocks.get(symbol, pd.DataFrame(columns=stock_history.columns))
+                    stock_history = append_days(stock_history, new_rows, missing_days[symbol])
+                    self.history_cache.write(symbol, stock_history, covered_dates | set(missing_days[symbol]))
+        except Exception as e:
+            print("{} Failed to refresh the stock histories, got {}".format(DATA_COMMON_MESSAGE_HEADER, e))
+
+
     def get_stock_name(self, stock_symbol: str) -> str:
+        """ Get the name of a stock using its ticker
+
+        Description
+        -----------
+        Looks up the name in the SymbolNameStore first and only parses the webpages if the name isn't stored there.
+        The result of the parsing is added to the store, also when no name was found.
+
+        Parameters
+        ----------
+        symbol : str
+            Ticker symbol for the stock of interest
+
+        Returns
+        -------
+        str
+            Name of the stock, if parsing wasn't successful it is set to an empty string
+
+        """
+
+        stock_name = self.symbol_names.get(stock_symbol)
+        if stock_name is None:
+            stock_name = self.parse_stock_name(stock_symbol)
+            self.symbol_names.set(stock_symbol, stock_name)
+
+        return stock_name
+
+
+    def parse_stock_name(self, stock_symbol: str) -> str:
         """ Get the name of a stock using its ticker from Yahoo finance
 
         Description
         -----------
-        Parses finance.yahoo using BeautifulSoup to find the name of a stock based on its ticker symbol.
+        Parses finance.yahoo using BeautifulSoup to find the name of a stock based on its ticker symbol. Marketwatch
+        is used as a backup if Yahoo finance doesn't have a proper name.
 
         Parameters
         ----------
@@ -76,15 +336,15 @@ class DataCommon():
             yahoo_link = self.get_yahoo_finance_webpage(stock_symbol)
             market_watch_link = self.get_marketwatch_webpage(stock_symbol)
 
-            data = requests.get(yahoo_link)
-            soup = BeautifulSoup(data.text, "html.parser")
+            data = self.web_session.get_page(yahoo_link)
+            soup = BeautifulSoup(data, "html.parser")
             stock_name = soup.find("h1", {"class": "D(ib) Fz(18px)"}).text.split("(")[0].rstrip()
 
             if stock_name and not stock_name.isnumeric():
                 return stock_name
 
-            data = requests.get(market_watch_link)
-            soup = BeautifulSoup(data.text, "html.parser")
+            data = self.web_session.get_page(market_watch_link)
+            soup = BeautifulSoup(data, "html.parser")
             stock_name = soup.find("h1", {"class": "company__name"}).text
 
             if stock_name:
@@ -176,14 +436,204 @@ class DataCommon():
         return "http://www.sentdex.com/financial-analysis/?i={}&tf=all".format(stock_symbol)
 
 
+def index_on_symbol(stock_df: pd.DataFrame) -> pd.DataFrame:
+    """ Index a stocklist on its symbols
+
+    Description
+    -----------
+    The symbols are copied to an index named SYMBOL_INDEX_NAME, the "Symbol" column is kept so that the columns seen
+    by the GUI don't change. Rows without a symbol are dropped and only the first row of a symbol that exists several
+    times is kept, so that the index is unique. A stocklist that already is indexed on its symbols is returned as is.
+
+    Parameters
+    ----------
+    stock_df : pandas.DataFrame
+        The stocklist to index
+
+    Returns
+    -------
+    pandas.DataFrame
+        The stocklist with a unique symbol index
+
+    """
+
+    if is_indexed_on_symbol(stock_df) or "Symbol" not in stock_df.columns:
+        return stock_df
+
+    stock_df = stock_df.dropna(subset=["Symbol"])
+    stock_df = stock_df[~stock_df["Symbol"].duplicated()]
+    stock_df = stock_df.set_index(pd.Index(stock_df["Symbol"].values, name=SYMBOL_INDEX_NAME))
+
+    return stock_df
+
+
+def is_indexed_on_symbol(stock_df: pd.DataFrame) -> bool:
+    # Pandas caches the uniqueness of an index, so this is only computed once per index
+    return stock_df.index.name == SYMBOL_INDEX_NAME and stock_df.index.is_unique
+
+
+def get_stock(stock_df: pd.DataFrame, stock_symbol: str) -> pd.Series:
+    """ Get the row of a stock from a stocklist indexed on symbol, None is returned if the stock doesn't exist """
+
+    try:
+        return stock_df.loc[stock_symbol]
+    except KeyError:
+        return None
+
+
+def merge_updated_stocks(stock_df: pd.DataFrame, updated_stock_df: pd.DataFrame) -> pd.DataFrame:
+    """ Insert or update stocks in a stocklist
+
+    Description
+    -----------
+    Every value that isn't null in 'updated_stock_df' replaces the value of the same stock and column in 'stock_df'.
+    The stocks are matched on their symbol and stocks that don't exist in 'stock_df' are appended to it. The rows to
+    change are looked up with the symbol index and every column is then assigned in a single operation, so the cost
+    depends on the number of updated stocks and not on the size of the stocklist. Columns keep their dtype when the
+    new values allow it.
+
+    Parameters
+    ----------
+    stock_df : pandas.DataFrame
+        The stocklist to update, it is modified in place unless new stocks are appended. It is indexed on symbol if it
+        isn't already.
+    updated_stock_df : pandas.DataFrame
+        The updated stocks
+
+    Returns
+    -------
+    pandas.DataFrame
+        The updated stocklist, indexed on symbol
+
+    """
+
+    updated_stock_df = updated_stock_df.dropna(subset=["Symbol"]).drop_duplicates(subset="Symbol", keep="last")
+    updated_stock_df = apply_stocklist_schema(index_on_symbol(updated_stock_df))
+    if stock_df.empty:
+        return updated_stock_df
+
+    stock_df = index_on_symbol(stock_df)
+    original_dtypes = stock_df.dtypes
+    positions = stock_df.index.get_indexer(updated_stock_df.index)
+
+    is_existing_stock = positions >= 0
+    existing_positions = positions[is_existing_stock]
+    existing_stocks = updated_stock_df[is_existing_stock]
+
+    for col in updated_stock_df.columns:
+        if col == "Symbol":
+            continue
+
+        values = existing_stocks[col]
+        has_value = values.notna().values
+        if not has_value.any():
+            continue
+
+        if col not in stock_df.columns:
+            stock_df[col] = np.nan
+
+        new_values = values.values[has_value]
+        if isinstance(stock_df[col].dtype, pd.CategoricalDtype):
+            new_values = np.asarray(new_values, dtype=object)
+            new_categories = pd.Index(pd.unique(new_values)).difference(stock_df[col].cat.categories)
+            if len(new_categories) > 0:
+                stock_df[col] = stock_df[col].cat.add_categories(new_categories)
+
+        rows, col_position = existing_positions[has_value], stock_df.columns.get_loc(col)
+        try:
+            stock_df.iloc[rows, col_position] = new_values
+        except (ValueError, TypeError):
+            # Values that the dtype of the column can't hold, e.g. text in a volume column
+            stock_df[col] = stock_df[col].astype(object)
+            stock_df.iloc[rows, col_position] = new_values
+
+    if not is_existing_stock.all():
+        stock_df = pd.concat([stock_df, updated_stock_df[~is_existing_stock]])
+
+    for col, dtype in original_dtypes.items():
+        # Casting back could lose new categories or round floats that no longer fit in float32, the schema below
+        # gives these columns their dtype instead
+        if isinstance(dtype, pd.CategoricalDtype) or dtype == np.float32:
+            continue
+
+        if stock_df[col].dtype != dtype and not stock_df[col].isna().any():
+            try:
+                stock_df[col] = stock_df[col].astype(dtype)
+            except (ValueError, TypeError):
+                pass
+
+    changed_columns = [col for col in stock_df.columns
+                       if col not in original_dtypes or stock_df[col].dtype != original_dtypes[col]]
+    return apply_stocklist_schema(stock_df, changed_columns + STOCKLIST_CATEGORY_COLUMNS)
+
+
+def apply_stocklist_schema(stock_df: pd.DataFrame, columns: list = None) -> pd.DataFrame:
+    """ Give the columns of a stocklist compact dtypes
+
+    Description
+    -----------
+    The string columns in STOCKLIST_CATEGORY_COLUMNS become categoricals. Their categories are kept sorted, so that
+    sorting the column gives the same order as sorting the strings. The columns in STOCKLIST_INTEGER_COLUMNS become
+    nullable integers with their values rounded, and other float64 columns are stored as float32 if no value changes
+    by it. A column that can't be converted keeps its dtype. The stocklist is gathered, updated and read through this
+    function, so every process sees the same dtypes.
+
+    Parameters
+    ----------
+    stock_df : pandas.DataFrame
+        The stocklist, it is modified in place
+    columns : list
+        Optional, only these columns are converted
+
+    Returns
+    -------
+    pandas.DataFrame
+        The stocklist
+
+    """
+
+    columns = stock_df.columns if columns is None else [col for col in stock_df.columns if col in columns]
+    for col in columns:
+        series = stock_df[col]
+        if col in STOCKLIST_CATEGORY_COLUMNS:
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                if not series.cat.categories.is_monotonic_increasing:
+                    try:
+                        stock_df[col] = series.cat.set_categories(series.cat.categories.sort_values())
+                    except TypeError:
+                        pass
+            elif pd.api.types.infer_dtype(series, skipna=True) == "string":
+                stock_df[col] = series.astype("category")
+        elif col in STOCKLIST_INTEGER_COLUMNS:
+            if series.dtype != STOCKLIST_INTEGER_COLUMNS[col]:
+                try:
+                    stock_df[col] = pd.to_numeric(series).round().astype(STOCKLIST_INTEGER_COLUMNS[col])
+                except (ValueError, TypeError):
+                    pass
+        elif series.dtype == np.float64:
+            values = series.values.astype(np.float32)
+            if np.array_equal(values, series.values, equal_nan=True):
+                stock_df[col] = values
+
+    return stock_df
+
+
 def cell_contains(series: pd.Series, search_string, *args) -> pd.Series:
+    text_index = args[0] if args else None
+    if text_index is not None and text_index.can_search(search_string):
+        return pd.Series(text_index.contains(search_string), index=series.index)
+
     search_string = search_string.lower()
     contains = series.str.contains(search_string, case=False)
     contains = contains.fillna(False)
     return contains
 
 
-def cell_does_not_contain(series: pd.Series, search_string, *arg) -> pd.Series:
+def cell_does_not_contain(series: pd.Series, search_string, *args) -> pd.Series:
+    text_index = args[0] if args else None
+    if text_index is not None and text_index.can_search(search_string):
+        return pd.Series(text_index.does_not_contain(search_string), index=series.index)
+
     search_string = search_string.lower()
     contains = ~series.str.contains(search_string, case=False)
     contains = contains.fillna(False)
@@ -201,6 +651,10 @@ def cell_is_not_nan(series: pd.Series, *args) -> pd.Series:
 
 
 def cell_string_equals(series: pd.Series, search_string, *args) -> pd.Series:
+    text_index = args[0] if args else None
+    if text_index is not None and text_index.can_search(search_string):
+        return pd.Series(text_index.equals(search_string), index=series.index)
+
     search_string = search_string.lower()
     contains = series.str.lower() == search_string
     contains = contains.fillna(False)
@@ -208,6 +662,10 @@ def cell_string_equals(series: pd.Series, search_string, *args) -> pd.Series:
 
 
 def cell_string_not_equals(series: pd.Series, search_string, *args) -> pd.Series:
+    text_index = args[0] if args else None
+    if text_index is not None and text_index.can_search(search_string):
+        return pd.Series(~text_index.equals(search_string), index=series.index)
+
     search_string = search_string.lower()
     does_not_contain = series.str.lower() != search_string
     does_not_contain = does_not_contain.fillna(False)
@@ -1,59 +1,69 @@
 # Import relevant packages
-import ast
-import math
 import matplotlib.pyplot as plt
 import multiprocessing as mp
 import numpy as np
 import pandas as pd
 import pandas_datareader as web
-import requests
+import time
 import yahoo_fin.stock_info as ya
 
 from alpha_vantage.sectorperformance import SectorPerformances
 from alpha_vantage.techindicators import TechIndicators
 from alpha_vantage.timeseries import TimeSeries
-from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import date
 from pathlib import Path
 from queue import Empty
 from typing import List, Tuple
 
-from DataCommon import DataCommon
+from DataCommon import DataCommon, apply_stocklist_schema, merge_updated_stocks
 from Definitions import *
+from Messages import UpdateReply, UpdateResult, WorkItem
+from MomentumTable import MomentumTable
+from SharedSnapshot import SnapshotPublisher
+from TableParser import parse_table
 
 
 class DataGatherer(DataCommon):
     """ This class is used to gather all stockdata that might be of interest.
     Description
     -----------
-    Upon initialization it takes in a lock and a queue. The lock is used to access the files where data is stored
-    while the queue is used to know when to gather data and to signal when new data is available.
+    Upon initialization it takes in a lock and a queue. The lock makes sure that only one process at a time writes the
+    files where data is stored, while the queue is used to know when to gather data and to signal when new data is
+    available.
 
     The intention is that this class communicates with the class DataInterface (which in turn is controlled by
-    the GUI class) via the queue. The DataInterface puts stocks and which attrubutes it wants more information on
-    in the queue and this class continuously checks the queue for new stocks. To not fill the queue with to much
-    the variable ENOUGH_STOCKS_UPDATED_TO_SIGNAL determines how many stocks the DataInterface can request at a time.
-    E.g. if ENOUGH_STOCKS_UPDATED_TO_SIGNAL = 5 then DataInterface can at most put 5 stocks at a time in the queue
-    and it won't be able to put anymore stocks in there until the DataGatherer has signaled that it has handled
-    those 5.
+    the GUI class) via the queue. The DataInterface puts UpdateRequests, each containing up to
+    ENOUGH_STOCKS_UPDATED_TO_SIGNAL stocks and which attributes it wants more information on, in the queue and this
+    class continuously checks the queue for new requests. When all stocks in a request have been handled they are
+    written to the datafile and an UpdateReply with the changed rows is sent back to the DataInterface. To not fill
+    the queue with too much the DataInterface has at most MAX_PENDING_UPDATE_REQUESTS requests in the queue at once.
 
     Attributes
     ----------
-    updated_stocks : int
-        An int intended to keep track of the number of stocks that have been updated
-    updated_stocks_df : pd.DataFrame
-        A dataframe where stocks that have been updated are stored
+    twitter_momentum : MomentumTable
+        All 1 and 7 day momentum data that has been found on tradefollowers today
+    stocklist : pandas.DataFrame
+        The stocklist kept in memory by the writer process, None in the other processes
+    data_version : int
+        Number of UpdateResults that the writer has stored
+    snapshot_publisher : SnapshotPublisher
+        Publishes the in-memory stocklist in shared memory for the DataInterface, None if there is nowhere to publish
     lock : multiprocessing.Lock
-        A lock that is used to ensure exclusive access to the datafile
-    queue : dict{multiprocessing.Queue, multiprocessing.Queue}
-        A dict containgin two queue's that is used to communicate with DataInterface
+        A lock that is used to ensure that only one process at a time writes the datafile
+    queue : dict{multiprocessing.Queue, multiprocessing.Queue, multiprocessing.Queue}
+        A dict containgin the queue's that are used to communicate with DataInterface and between the worker
+        processes and the writer process
 
     """
 
-    def __init__(self, lock: mp.Lock, queue: mp.Queue):
+    def __init__(self, lock: mp.Lock, queue: mp.Queue, snapshot_directory: dict = None):
         super().__init__(lock, queue)
-        self.updated_stocks = 0
-        self.updated_stocks_df = pd.DataFrame()
+        self.twitter_momentum = MomentumTable()
+        self.stocklist = None
+        self.data_version = 0
+        self.snapshot_publisher = SnapshotPublisher(snapshot_directory) if snapshot_directory is not None else None
+        self.last_publish_time = 0
 
 
     def gather_new_data(self) -> None:
@@ -62,9 +72,12 @@ class DataGatherer(DataCommon):
         Description
         -----------
         This is the function that is called upon startup. If the file with all stock information has already been
-        created, this functions does nothing. If it doesn't exist it will loop through the Enum 'stocklist_enum'
-        and call 'get_stocklist' for each enum to build up a dict (where the keys are defined by the enum values)
-        to save.
+        created, this functions does nothing. If it doesn't exist it will call 'get_stocklist' for every value in the
+        Enum 'stocklist_enum' to build up a dict (where the keys are defined by the enum values) to save.
+
+        The stocklists are fetched concurrently, one thread per source, so that the startup time is decided by the
+        slowest source rather than the sum of all of them. A source that hasn't finished within
+        STOCKLIST_FETCH_TIMEOUT seconds is left out of the merge. The lock is only held while writing the result.
         """
 
         try:
@@ -72,19 +85,97 @@ class DataGatherer(DataCommon):
                 with self.lock:
                     Path.mkdir(CURRENT_DATA_FOLDER)
 
-            if not any(Path(CURRENT_DATA_FOLDER).iterdir()):
-                with self.lock:
-                    stock_dict = {}
-                    for stocklist in stocklist_enum:
-                        stock_dict[stocklist] = self.get_stocklist(stocklist)
+            with self.lock:
+                # Start from compacted stocklists, also for the days when the program was closed before compacting.
+                # This also moves stocklists stored the old way over to the storage backend, and adds the days
+                # that are missing in the history store.
+                for folder in DATA_FOLDER.iterdir():
+                    if folder.is_dir():
+                        self.compact_data(folder)
+                        self.update_history(folder)
+
+            self.refresh_stock_histories()
+
+            # Other files, e.g. the momentum table, can be stored in the folder so look for the stocklist itself
+            if not self.storage.exists(CURRENT_DATA_FOLDER):
+                stock_dict = self.get_stocklists_concurrently()
+                stock_df = self.merge_stocklists(stock_dict)
 
-                    stock_df = self.merge_stocklists(stock_dict)
+                if stock_df.empty:
+                    print("{} No stocklist could be gathered.".format(DATA_GATHERER_MESSAGE_HEADER))
+                    return
+
+                with self.lock:
                     self.write_data(stock_df)
 
         except Exception as e:
             print("{} Failed to gather data, got {}".format(DATA_GATHERER_MESSAGE_HEADER, e))
 
 
+    def get_stocklists_concurrently(self) -> dict:
+        """ Fetch all stocklists in parallel
+
+        Description
+        -----------
+        Submits 'get_stocklist' for every value in 'stocklist_enum' to a thread pool and waits for all of them to
+        finish or for STOCKLIST_FETCH_TIMEOUT seconds to pass. The time it took for each source is printed. Sources
+        that failed or timed out are represented by an empty dataframe.
+
+        Returns
+        -------
+        dict
+            A dict with a dataframe for every stocklist_enum value
+        """
+
+        start_time = time.perf_counter()
+        executor = ThreadPoolExecutor(max_workers=len(stocklist_enum))
+        futures = {executor.submit(self.timed_get_stocklist, stocklist): stocklist for stocklist in stocklist_enum}
+        done, not_done = wait(futures, timeout=STOCKLIST_FETCH_TIMEOUT)
+        # Don't wait for sources that timed out, their threads are left to finish in the background
+        executor.shutdown(wait=False)
+
+        stock_dict = {}
+        for future, stocklist in futures.items():
+            stock_dict[stocklist] = pd.DataFrame()
+            if future in not_done:
+                print("{} {} timed out after {:.1f} s.".format(DATA_GATHERER_MESSAGE_HEADER,
+                                                              stocklist.name,
+                                                              STOCKLIST_FETCH_TIMEOUT))
+                continue
+
+            try:
+                stock_dict[stocklist], elapsed_time = future.result()
+                print("{} {} fetched in {:.1f} s.".format(DATA_GATHERER_MESSAGE_HEADER, stocklist.name, elapsed_time))
+            except Exception as e:
+                print("{} Failed to get {}, got {}".format(DATA_GATHERER_MESSAGE_HEADER, stocklist.name, e))
+
+        print("{} All stocklists gathered in {:.1f} s.".format(DATA_GATHERER_MESSAGE_HEADER,
+                                                              time.perf_counter() - start_time))
+
+        return stock_dict
+
+
+    def timed_get_stocklist(self, stocklist: stocklist_enum) -> Tuple[pd.DataFrame, float]:
+        """ Call 'get_stocklist' and measure how long it took
+
+        Parameters
+        ----------
+        stocklist : stocklist_enum
+            Which stocklist that data should be gathered for
+
+        Returns
+        -------
+        Tuple[pandas.DataFrame, float]
+            The stocklist and the time in seconds it took to get it
+
+        """
+
+        start_time = time.perf_counter()
+        stocks_df = self.get_stocklist(stocklist)
+
+        return stocks_df, time.perf_counter() - start_time
+
+
     def merge_stocklists(self, stocklists: dict) -> pd.DataFrame:
         """ Merges output data gathered by gather_new_data
 
@@ -107,6 +198,10 @@ class DataGatherer(DataCommon):
 
         stock_df = pd.DataFrame()
         for stocklist in stocklist_enum:
+            # A source that failed or timed out is simply left out
+            if stocklists[stocklist].empty or "Symbol" not in stocklists[stocklist].columns:
+                continue
+
             if stock_df.empty:
                 stock_df = stocklists[stocklist]
                 continue
@@ -122,81 +217,167 @@ class DataGatherer(DataCommon):
 
 
         # Make the stocklist a bit more nicer
-        stock_df.drop(['Market Cap'], axis=1, inplace=True)
-        stock_df["Volume"] = stock_df["Volume"].apply(lambda x: int(x) if not math.isnan(x) else np.nan)
-        stock_df["Name"] = stock_df["Name"].apply(lambda x: x if x else np.nan)
-        stock_df["Avg Vol (3 month)"] = stock_df["Avg Vol (3 month)"].apply(lambda x: int(x) if not math.isnan(x) else np.nan)
+        stock_df.drop(['Market Cap'], axis=1, inplace=True, errors="ignore")
+        if "Name" in stock_df.columns:
+            stock_df["Name"] = stock_df["Name"].apply(lambda x: x if x else np.nan)
         # This column is added to indicate if a stock has attempted to be updated at some point
         stock_df["Updated"] = False
 
-        return stock_df
+        return apply_stocklist_schema(stock_df)
+
+
+    def write_worker_results(self) -> None:
+        """ Store the stocks enriched by the worker processes
+
+        Description
+        -----------
+        This is the only function that writes to the datafile after startup, which means that there are never several
+        processes writing at the same time. The workers put an UpdateResult in the queue for every UpdateRequest they
+        have handled, which is stored and replied to one at a time.
+
+        This function never returns.
+        """
+
+        while True:
+            try:
+                result = self.queue[DATA_WRITER_MESSAGE_HEADER].get(timeout=QUEUE_POLL_TIMEOUT)
+            except Empty:
+                self.publish_stocklist(idle=True)
+                continue
+
+            try:
+                self.store_update_result(result)
+            except Exception as e:
+                print("{} Failed to store results, got {}".format(DATA_GATHERER_MESSAGE_HEADER, e))
 
 
-    def check_message_queue(self) -> None:
-        """ Update stocks that have missing data
+    def enrich_stock(self, item: WorkItem) -> pd.DataFrame:
+        """ Gather missing data for a stock
 
         Description
         -----------
-        After the DataGatherer has initialized and called 'gather_new_data' this function will get called. This function
-        checks the queue to see if there is a message available, if there is a message available it will determine if
-        it contains something it can act upon. If the messsage contains a 'UPDATE' message together with a stock symbol
-        and columns with missing data it will try to gather this data. The columns with missing data is parsed to
-        determine which data to try and gather, if the data isn't found the stock will still be marked as 'updated' to
-        indicate that it has been looked at.
-
-        The message in the queue should be at string in the format:
-        - "COMMAND > [Comma separated list with information specific to the command]"
-
-        The following commands can be handled by this function:
-        - UDPATE > "['{Stock symbol}', {[Column names with null or nan values stored as strings]}]"
+        Tries to find data for the columns with missing data. The returned stock is always marked as 'Updated',
+        also if no data was found. This function only fetches data, it doesn't change any state in the DataGatherer,
+        so it can be called from several threads at once.
+
+        Parameters
+        ----------
+        item : WorkItem
+            The stock to update and its columns with missing data
+
+        Returns
+        -------
+        pandas.DataFrame
+            A dataframe with one row containing the data that was found
+
         """
 
+        stock_symbol = item.symbol
+        columns_with_missing_data = item.missing_columns
+
+        # The stockname isn't always available so it's better to get it here
+        stock_name = self.get_stock_name(stock_symbol)
+        # Initialize stock_data
+        stock_data = pd.DataFrame(columns=columns_with_missing_data)
+        stock_data.loc[0, "Symbol"] = stock_symbol
+        stock_data["Updated"] = True
+        stock_data["Name"] = stock_name
+
+        if set(["Twit_1d_Mom", "Twit_7d_Mom"]).intersection(set(columns_with_missing_data)) and stock_name:
+            success, twitter_momentum = self.get_one_and_seven_day_momentum_from_twitter(stock_symbol, stock_name)
+            if success:
+                print("{} Found twitter data for {}!".format(DATA_GATHERER_MESSAGE_HEADER, stock_name))
+                stock_data["Twit_1d_Mom"] = twitter_momentum["Twit_1d_Mom"]
+                stock_data["Twit_7d_Mom"] = twitter_momentum["Twit_7d_Mom"]
+
+        print("{} Finished with {} ({})".format(DATA_GATHERER_MESSAGE_HEADER,
+                                                stock_name,
+                                                stock_symbol))
+
+        return stock_data
+
+
+    def combine_enriched_stocks(self, stocks: list) -> pd.DataFrame:
+        """ Combine the single row dataframes returned by 'enrich_stock', None values are skipped """
+
+        stocks = [stock_data for stock_data in stocks if stock_data is not None]
+
+        return pd.concat(stocks, ignore_index=True) if stocks else pd.DataFrame()
+
+
+    def store_update_result(self, result: UpdateResult) -> None:
+        """ Write the stocks in an UpdateResult and reply to the DataInterface
+
+        If the stocks can't be stored the DataInterface gets a failed reply instead, so that it doesn't wait for the
+        request forever.
+
+        Parameters
+        ----------
+        result : UpdateResult
+            The updated stocks of one UpdateRequest
+
+        """
+
+        try:
+            with self.lock:
+                if not result.stocks.empty:
+                    self.update_data(result.stocks)
+
+            self.data_version += 1
+            if self.stocklist is not None and not result.stocks.empty:
+                self.stocklist = merge_updated_stocks(self.stocklist, result.stocks)
+        except Exception:
+            self.queue[DATA_INTERFACE_MESSAGE_HEADER].put(UpdateReply(result.request_id, pd.DataFrame(), failed=True))
+            raise
+
+        self.queue[DATA_INTERFACE_MESSAGE_HEADER].put(UpdateReply(result.request_id, result.stocks, self.data_version))
+        self.flush_stores()
+        self.publish_stocklist()
+
+
+    def load_stocklist(self) -> None:
+        """ Keep the stocklist in memory in the writer process and publish it in shared memory
+
+        Description
+        -----------
+        Should be called once the stocklist has been gathered and before the DataInterface starts, so that it can get
+        the stocklist from shared memory instead of reading it from disk. The results stored afterwards are merged
+        into the in-memory stocklist, which is published again by 'publish_stocklist'.
+        """
+
+        self.stocklist = self.read_data()
+        self.publish_stocklist(idle=True)
+
+
+    def publish_stocklist(self, idle: bool = False) -> None:
+        """ Publish the in-memory stocklist if it has changed
+
+        Parameters
+        ----------
+        idle : bool
+            If False the stocklist is published at most every SNAPSHOT_PUBLISH_INTERVAL seconds
+
+        """
+
+        if self.snapshot_publisher is None or self.stocklist is None:
+            return
+
+        if not idle and time.monotonic() - self.last_publish_time < SNAPSHOT_PUBLISH_INTERVAL:
+            return
+
         try:
-            # Check if there is a message available in the queue
-            message = [element.strip() for element in self.queue[DATA_GATHERER_MESSAGE_HEADER].get_nowait().split(">")]
-            command = message[0]
-            command_data = ast.literal_eval(message[1])
-
-            if  command == "UPDATE":
-                self.updated_stocks += 1
-                stock_symbol = command_data[0]
-                columns_with_missing_data = command_data[1]
-                # The stockname isn't always available so it's better to get it here
-                stock_name = self.get_stock_name(stock_symbol)
-                # Initialize stock_data
-                stock_data = pd.DataFrame(columns=columns_with_missing_data)
-                stock_data.loc[0, "Symbol"] = stock_symbol
-                stock_data["Updated"] = True
-                stock_data["Name"] = stock_name
-
-                if set(["Twit_1d_Mom", "Twit_7d_Mom"]).intersection(set(columns_with_missing_data)) and stock_name:
-                        success, twitter_momentum = self.get_one_and_seven_day_momentum_from_twitter(stock_symbol, stock_name)
-                        if success:
-                            print("{} Found twitter data for {}!".format(DATA_GATHERER_MESSAGE_HEADER, stock_name))
-                            stock_data["Twit_1d_Mom"] = twitter_momentum["Twit_1d_Mom"]
-                            stock_data["Twit_7d_Mom"] = twitter_momentum["Twit_7d_Mom"]
-
-                print("{} Finished with {} ({})".format(DATA_GATHERER_MESSAGE_HEADER,
-                                                        stock_name,
-                                                        stock_symbol))
-
-                if not self.updated_stocks_df.empty:
-                    # Make sure they have the same columns before concatenating
-                    stock_data = stock_data.merge(self.updated_stocks_df, how="left")
-                    self.updated_stocks_df = pd.concat([self.updated_stocks_df, stock_data])
-                else:
-                    self.updated_stocks_df = stock_data
-
-                # Check if all stocks available in the queue has been handled
-                if self.updated_stocks % ENOUGH_STOCKS_UPDATED_TO_SIGNAL == 0 or "FINAL" in command[0]:
-                    with self.lock:
-                        self.update_data(self.updated_stocks_df)
-                        self.queue[DATA_INTERFACE_MESSAGE_HEADER].put("NEW_DATA")
-                        self.updated_stocks_df = pd.DataFrame()
-
-        except Empty:
-            # print("{} No message available in queue.".format(DATA_GATHERER_MESSAGE_HEADER))
-            pass
+            self.snapshot_publisher.publish(self.stocklist, self.data_version)
+        except Exception as e:
+            print("{} Failed to publish the stocklist, got {}".format(DATA_GATHERER_MESSAGE_HEADER, e))
+
+        self.last_publish_time = time.monotonic()
+
+
+    def flush_stores(self) -> None:
+        """ Write the symbol names and momentum data found so far to disk """
+
+        self.symbol_names.flush()
+        self.twitter_momentum.flush()
 
 
     def get_most_active_stocks_from_yahoo(self) -> list:
@@ -217,7 +398,7 @@ class DataGatherer(DataCommon):
     def get_monthly_sentiment_data_from_sentdex(self) -> pd.DataFrame:
         """ Gather sentimentdata for the last 30 days from 'http://www.sentdex.com'
 
-        This function parses the sentdex webpage using BeautifulSoup to gather the stocks and their sentiment data from
+        This function parses the sentdex webpage using parse_table to gather the stocks and their sentiment data from
         the 30-day list. This function is taken from:
         'https://medium.com/swlh/stock-market-screening-and-analysis-using-web-scraping-neural-networks-and-regression-analysis-f40742dd86e0'
 
@@ -229,31 +410,11 @@ class DataGatherer(DataCommon):
 
         """
 
-        res = requests.get('http://www.sentdex.com/financial-analysis/?tf=30d')
-        soup = BeautifulSoup(res.text, "html.parser")
-        table = soup.find_all('tr')
-        # Initialize empty lists to store stock symbol, sentiment and mentions
-        ticker_name = []
-        mentions = []
-        sentiment = []
-        sentiment_trend = []
-
-        # Use try and except blocks to mitigate missing data
-        for ticker in table:
-            ticker_info = ticker.find_all('td')
-
-            if ticker_info:
-                try:
-                    ticker_name.append(ticker_info[0].get_text())
-                    mentions.append(ticker_info[2].get_text())
-                    sentiment.append(ticker_info[3].get_text())
-
-                    if (ticker_info[4].find('span', {"class":"glyphicon  glyphicon-chevron-up"})):
-                        sentiment_trend.append('up')
-                    else:
-                        sentiment_trend.append('down')
-                except:
-                    print("{} No data found, continue with next ticker.".format(DATA_GATHERER_MESSAGE_HEADER))
+        res = self.web_session.get_page('http://www.sentdex.com/financial-analysis/?tf=30d')
+        # Rows with missing data are skipped by the parser, the arrow in the fifth cell shows the sentiment trend
+        ticker_name, mentions, sentiment, trending_up = parse_table(res, [0, 2, 3],
+                                                                   markers={4: "glyphicon-chevron-up"})
+        sentiment_trend = ['up' if is_up else 'down' for is_up in trending_up]
 
         company_info = pd.DataFrame(data={'Symbol': ticker_name,
                                           'Sentiment': sentiment,
@@ -287,27 +448,13 @@ class DataGatherer(DataCommon):
 
         """
 
-        res = requests.get(page)
-        soup = BeautifulSoup(res.text, "html.parser")
-        twitter_stocks = soup.find_all('tr')
+        res = self.web_session.get_page(page)
+        twitter_stocks = parse_table(res, [0, 2, 3, 4], cell_class="datalistcolumn")
 
-        twit_stock = []
-        sector = []
-        industry = []
-        twit_score = []
-
-        for stock in twitter_stocks:
-            try:
-                score = stock.find_all("td", {"class": "datalistcolumn"})
-                twit_stock.append(score[0].get_text().replace('$','').strip())
-                sector.append(score[2].get_text().replace('\n','').strip())
-                industry.append(score[3].get_text().replace('\n','').strip())
-                twit_score.append(score[4].get_text().replace('\n','').strip())
-            except:
-                twit_stock.append(np.nan)
-                sector.append(np.nan)
-                industry.append(np.nan)
-                twit_score.append(np.nan)
+        twit_stock = [stock.replace('$','').strip() for stock in twitter_stocks[0]]
+        sector = [sector.replace('\n','').strip() for sector in twitter_stocks[1]]
+        industry = [industry.replace('\n','').strip() for industry in twitter_stocks[2]]
+        twit_score = [score.replace('\n','').strip() for score in twitter_stocks[3]]
 
         return (twit_stock, sector, industry, twit_score)
 
@@ -381,8 +528,12 @@ class DataGatherer(DataCommon):
 
         Description
         -----------
-        This function gathers 1 and 7 day momentum score for a given ticker symbol. It is intended to be used in
-        check_message_queue when the GUI has requested some information to be gathered for a stock.
+        This function gathers 1 and 7 day momentum score for a given ticker symbol. It is used by the
+        EnrichmentEngine when the GUI has requested some information to be gathered for a stock.
+
+        The stock is first looked up in the momentum table. If it isn't there the stock_list page on tradefollowers
+        is searched for the name of the stock and every row on the page is added to the table, since later requests
+        for the other stocks on the page then can be answered from the table.
 
         Parameters
         ----------
@@ -398,25 +549,46 @@ class DataGatherer(DataCommon):
 
         """
 
-        momentum_data = requests.get("https://www.tradefollowers.com/stock/stock_list.jsp?s={}".format(name))
-        soup = BeautifulSoup(momentum_data.text, "html.parser")
-        table = soup.find_all('tr')
-        data = {"Twit_1d_Mom": np.nan, "Twit_7d_Mom": np.nan}
-        success = False
-
-        for stock in table:
-            stock_info = stock.find_all("td", {"class": "datalistcolumn"})
-            if stock_info:
-                page_symbol = stock_info[0].get_text().strip().replace("$", "")
-                if symbol == page_symbol:
-                    daily_momentum = float(stock_info[4].get_text().strip())
-                    seven_day_momentum = float(stock_info[5].get_text().strip())
-                    data["Twit_1d_Mom"] = daily_momentum
-                    data["Twit_7d_Mom"] = seven_day_momentum
-                    success = True
-                    break
-
-        return success, data
+        data = self.twitter_momentum.get(symbol)
+        if data is None:
+            page_data = self.parse_twitter_momentum_page("https://www.tradefollowers.com/stock/stock_list.jsp?s={}".format(name))
+            # Remember that the stock has been searched for, even if it wasn't found
+            page_data.setdefault(symbol, {"Twit_1d_Mom": np.nan, "Twit_7d_Mom": np.nan})
+            self.twitter_momentum.add_page(page_data)
+            data = page_data[symbol]
+
+        success = not (np.isnan(data["Twit_1d_Mom"]) and np.isnan(data["Twit_7d_Mom"]))
+
+        return success, data.copy()
+
+
+    def parse_twitter_momentum_page(self, page: str) -> dict:
+        """ Parse all 1 and 7 day momentum scores from a stock_list page on tradefollowers
+
+        Parameters
+        ----------
+        page : str
+            String containing the webpage to parse
+
+        Returns
+        -------
+        dict
+            Maps every symbol on the page to a dict with the columns 'Twit_1d_Mom' and 'Twit_7d_Mom'
+
+        """
+
+        momentum_data = self.web_session.get_page(page)
+        symbols, daily_momentum, seven_day_momentum = parse_table(momentum_data, [0, 4, 5], cell_class="datalistcolumn")
+        page_data = {}
+
+        for page_symbol, daily, seven_day in zip(symbols, daily_momentum, seven_day_momentum):
+            try:
+                page_data[page_symbol.strip().replace("$", "")] = {"Twit_1d_Mom": float(daily.strip()),
+                                                                   "Twit_7d_Mom": float(seven_day.strip())}
+            except ValueError:
+                continue
+
+        return page_data
 
 
     def get_stocklist(self, stocklist: stocklist_enum) -> pd.DataFrame:
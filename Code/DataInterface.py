@@ -1,26 +1,50 @@
 import multiprocessing as mp
+import numpy as np
 from tkinter.constants import E
 import pandas as pd
+import time
 
-from DataCommon import DataCommon
+from DataCommon import DataCommon, index_on_symbol, merge_updated_stocks
 from datetime import date
-from pathlib import Path
+from itertools import count
 from queue import Empty
 from typing import Tuple
 
 from Definitions import *
+from FilterPipeline import FilterPipeline
+from Messages import UpdateReply, UpdateRequest, WorkItem
+from SharedSnapshot import copy_snapshot
+from SortCache import SortCache
+from StockHistoryCache import append_days, get_missing_days
 
 class DataInterface(DataCommon):
-    def __init__(self, lock: mp.Lock, queue: mp.Queue):
+    def __init__(self, lock: mp.Lock, queue: mp.Queue, snapshot_directory: dict = None):
         super().__init__(lock, queue)
+        self.snapshot_directory = snapshot_directory
+        self.data_version = None
+        self.snapshot_outdated = False
         self.stocklist = pd.DataFrame()
         self.working_stocklist = pd.DataFrame()
+        self.unsorted_working_stocklist = self.working_stocklist
         self.filtered_working_stocklist = pd.DataFrame()
         self.using_filtered_stocklist = False
         self.active_filters = []
-        self.waiting_for_new_data = False
-        self.num_stocks_requested_to_update = 0
-        self.next_stock_to_request = 0
+        self.filter_pipeline = FilterPipeline()
+        self.sort_cache = SortCache()
+        self.pending_requests = {}
+        self.request_ids = count()
+        self.requested_symbols = set()
+        self.missing_values = np.zeros((0, 0), dtype=bool)
+        self.missing_value_columns = []
+        self.needs_update = np.zeros(0, dtype=bool)
+        self.requested = np.zeros(0, dtype=bool)
+        self.pending_since = np.zeros(0)
+        self.priority_column = UPDATE_PRIORITY_COLUMN
+        self.priority_ascending = False
+        self.update_order = np.zeros(0, dtype=np.int64)
+        self.visible_order = np.zeros(0, dtype=np.int64)
+        self.prioritized_view = None
+        self.rank_time = None
 
         print("{} Update stocklist.".format(DATA_INTERFACE_MESSAGE_HEADER))
         self.initialize_stocklist()
@@ -29,11 +53,48 @@ class DataInterface(DataCommon):
     def initialize_stocklist(self) -> None:
         """ Initialize the stocklist and the working_stocklist variables
 
+        Description
+        -----------
+        The stocklist is copied from the snapshot published in shared memory by the DataGatherer. It is only read from
+        disk if no snapshot has been published.
+
+        """
+
+        stocklist = None
+        if self.snapshot_directory is not None:
+            stocklist, self.data_version = copy_snapshot(self.snapshot_directory)
+
+        if stocklist is None:
+            stocklist = self.read_data()
+        else:
+            stocklist = index_on_symbol(stocklist)
+
+        self.stocklist = stocklist
+        self.working_stocklist = self.stocklist.head().copy()
+        self.unsorted_working_stocklist = self.working_stocklist
+        self.index_missing_values()
+
+
+    def reload_stocklist(self) -> bool:
+        """ Replace the stocklist with the published snapshot once it is at least as new as the latest reply
+
+        Returns
+        -------
+        bool
+            True if the stocklist was replaced
+
         """
 
-        with self.lock:
-            self.stocklist = self.read_data()
-            self.working_stocklist = self.stocklist.head().copy()
+        stocklist, version = copy_snapshot(self.snapshot_directory)
+        if stocklist is None or version < self.data_version:
+            return False
+
+        print("{} Reloaded stocklist version {}.".format(DATA_INTERFACE_MESSAGE_HEADER, version))
+        self.stocklist = index_on_symbol(stocklist)
+        self.index_missing_values()
+        self.data_version = version
+        self.snapshot_outdated = False
+        return True
 
 
     def update_stocklist(self) -> bool:
@@ -54,25 +115,40 @@ class DataInterface(DataCommon):
         """
 
         update_treeview = False
-        if self.waiting_for_new_data:
+        while self.pending_requests:
             try:
-                message = self.queue[DATA_INTERFACE_MESSAGE_HEADER].get_nowait()
-                # print("{} Read message '{}'".format(DATA_INTERFACE_MESSAGE_HEADER, message))
-
-                if "NEW_DATA" in message:
-                    self.waiting_for_new_data = False
-                    print("{} Update stocklist!".format(DATA_INTERFACE_MESSAGE_HEADER))
-                    with self.lock:
-                        self.stocklist = self.read_data()
+                reply = self.queue[DATA_INTERFACE_MESSAGE_HEADER].get_nowait()
+                # print("{} Read message '{}'".format(DATA_INTERFACE_MESSAGE_HEADER, reply))
+
+                if isinstance(reply, UpdateReply) and reply.version is not None:
+                    if self.data_version is not None and reply.version != self.data_version + 1:
+                        # A reply has been missed, the stocklist is replaced once a new enough snapshot is published
+                        self.snapshot_outdated = self.snapshot_directory is not None
+                    self.data_version = reply.version
+
+                if isinstance(reply, UpdateReply) and reply.request_id in self.pending_requests:
+                    symbols = self.pending_requests.pop(reply.request_id)
+                    if reply.failed:
+                        print("{} Update of {} failed.".format(DATA_INTERFACE_MESSAGE_HEADER, symbols))
+                        self.release_requested_stocks(symbols)
+                    elif not reply.stocks.empty:
+                        print("{} Update stocklist!".format(DATA_INTERFACE_MESSAGE_HEADER))
+                        # The reply contains the changed rows so there is no need to read the datafile
+                        self.stocklist = merge_updated_stocks(self.stocklist, reply.stocks)
+                        self.update_missing_values(reply.stocks["Symbol"])
                         # The working stocklist is not updated until specifically told so
                         update_treeview = True
             except Empty:
-                pass
                 # print("{} No message found, sleeping...".format(DATA_INTERFACE_MESSAGE_HEADER))
+                break
             except Exception as e:
-                pass
-                # print("{} Something went wrong, got: {}".format(DATA_INTERFACE_MESSAGE_HEADER, e))
-        else:
+                print("{} Something went wrong, got: {}".format(DATA_INTERFACE_MESSAGE_HEADER, e))
+                break
+
+        if self.snapshot_outdated and self.reload_stocklist():
+            update_treeview = True
+
+        if len(self.pending_requests) < MAX_PENDING_UPDATE_REQUESTS:
             self.fill_queue_with_stocks_to_update()
 
         return update_treeview
@@ -83,31 +159,183 @@ class DataInterface(DataCommon):
 
         Description
         -----------
-        Loop through the stocklist to find stocks thas has missing data and put up to ENOUGH_STOCKS_UPDATED_TO_SIGNAL
-        stocks in the queue for the DataGatherer to update.
+        Take the stocks with missing data in order of priority, see 'update_priorities', and put UpdateRequests in the
+        queue for the DataGatherer until there are MAX_PENDING_UPDATE_REQUESTS requests waiting for a reply. Every
+        request contains up to ENOUGH_STOCKS_UPDATED_TO_SIGNAL stocks. The missing columns of every stock are taken
+        from 'missing_values', so the cost only depends on the number of requested stocks.
 
         """
 
-        self.waiting_for_new_data = True
-        for i, stock in enumerate(self.stocklist[self.next_stock_to_request::].iterrows()):
-            null_values = stock[1].isnull()
+        num_stocks = (MAX_PENDING_UPDATE_REQUESTS - len(self.pending_requests)) * ENOUGH_STOCKS_UPDATED_TO_SIGNAL
+        self.update_priorities()
+
+        positions, self.visible_order = self.take_update_candidates(self.visible_order, num_stocks)
+        # The visible stocks are also in the update order, they are marked first so that they aren't taken twice
+        self.requested[positions] = True
+        more_positions, self.update_order = self.take_update_candidates(self.update_order, num_stocks - len(positions))
+        positions = np.array(positions + more_positions, dtype=np.int64)
+        if positions.size == 0:
+            return
+
+        symbols = self.stocklist["Symbol"].values[positions]
+        self.requested[positions] = True
+        self.requested_symbols.update(symbols)
+
+        columns = np.array(self.missing_value_columns, dtype=object)
+        stocks_to_update = [WorkItem(symbol, columns[self.missing_values[position]].tolist())
+                            for symbol, position in zip(symbols, positions)]
+
+        for i in range(0, len(stocks_to_update), ENOUGH_STOCKS_UPDATED_TO_SIGNAL):
+            request = UpdateRequest(next(self.request_ids), stocks_to_update[i:i + ENOUGH_STOCKS_UPDATED_TO_SIGNAL])
+
+            print("{} Requesting update of {}.".format(DATA_INTERFACE_MESSAGE_HEADER,
+                                                       [item.symbol for item in request.items]))
+            self.queue[DATA_GATHERER_MESSAGE_HEADER].put(request)
+            self.pending_requests[request.request_id] = [item.symbol for item in request.items]
+
+
+    def release_requested_stocks(self, symbols: list) -> None:
+        """ Let stocks whose update failed be requested again """
 
-            if (self.num_stocks_requested_to_update % ENOUGH_STOCKS_UPDATED_TO_SIGNAL == 0 and
-                self.num_stocks_requested_to_update > 0):
-                self.next_stock_to_request = i
-                self.num_stocks_requested_to_update = 0
+        self.requested_symbols.difference_update(symbols)
+        positions = self.stocklist.index.get_indexer(symbols)
+        self.requested[positions[positions >= 0]] = False
+        # The stocks were taken out of the priority orders when they were requested
+        self.prioritized_view = None
+        self.rank_time = None
+
+
+    def take_update_candidates(self, order: np.ndarray, num_stocks: int) -> Tuple[list, np.ndarray]:
+        """ Take up to 'num_stocks' stocks that should be requested from the front of a priority order
+
+        Returns
+        -------
+        Tuple[list, numpy.ndarray]
+            The positions of the taken stocks and the rest of the order. Stocks that have been filled or requested
+            since the order was made are dropped from it.
+
+        """
+
+        positions = []
+        num_looked_at = 0
+        for position in order:
+            if len(positions) == num_stocks:
                 break
-            elif null_values.values.any() and stock[1]["Symbol"] and not stock[1]["Updated"]:
-                null_columns = [col for col, is_null in null_values.iteritems() if is_null]
-                message = "UPDATE > ['{}', {}]".format(stock[1]["Symbol"], str(null_columns))
 
-                # The number of stocks isn't necesarily evenly dividable by ENOUGH_STOCKS_UPDATED_TO_SIGNAL
-                if i == len(self.stocklist.index) - 1:
-                    message = message.replace("UPDATE", "FINAL_UPDATE")
+            num_looked_at += 1
+            if self.needs_update[position] and not self.requested[position]:
+                positions.append(position)
 
-                print("{} Putting '{}' in queue.".format(DATA_INTERFACE_MESSAGE_HEADER, message))
-                self.queue[DATA_GATHERER_MESSAGE_HEADER].put(message)
-                self.num_stocks_requested_to_update += 1
+        return positions, order[num_looked_at:]
+
+
+    def update_priorities(self) -> None:
+        """ Decide in which order the stocks with missing data are requested
+
+        Description
+        -----------
+        The stocks shown in the GUI come first, in the order they are shown, so the data the user is looking at is
+        filled in first. 'visible_order' is made again every time the viewed stocklist is replaced, which happens
+        when it is changed, sorted or filtered.
+
+        The other stocks are ranked on how important they are, from their value in 'priority_column', and on how long
+        they have been waiting. A stock that has waited UPDATE_PRIORITY_MAX_AGE seconds is ranked as high as the most
+        important one, so every stock is requested eventually. 'update_order' is ranked again every
+        UPDATE_PRIORITY_RANK_INTERVAL seconds and when stocks have been added or the view has been sorted.
+
+        """
+
+        view = self.get_working_stocklist()
+        if view is not self.prioritized_view:
+            positions = self.stocklist.index.get_indexer(view.index)
+            positions = positions[positions >= 0]
+            self.visible_order = positions[self.needs_update[positions] & ~self.requested[positions]]
+            self.prioritized_view = view
+
+        current_time = time.monotonic()
+        if self.rank_time is not None and current_time - self.rank_time < UPDATE_PRIORITY_RANK_INTERVAL:
+            return
+
+        candidates = np.flatnonzero(self.needs_update & ~self.requested)
+        importance = np.zeros(candidates.size)
+        if self.priority_column in self.stocklist.columns:
+            try:
+                values = self.stocklist[self.priority_column].iloc[candidates]
+                ranks = values.rank(ascending=self.priority_ascending, pct=True, na_option="bottom")
+                importance = 1 - ranks.values
+            except TypeError:
+                pass
+
+        age = np.minimum((current_time - self.pending_since[candidates]) / UPDATE_PRIORITY_MAX_AGE, 1)
+        # The sort is stable so stocks with the same priority are requested in stocklist order
+        self.update_order = candidates[np.argsort(-(importance + age), kind="stable")]
+        self.rank_time = current_time
+
+
+    def index_missing_values(self) -> None:
+        """ Find the missing values and the stocks to update in the whole stocklist
+
+        Description
+        -----------
+        'missing_values' is the null mask of the stocklist with one row per stock, 'needs_update' tells which stocks
+        have missing values and should be requested and 'requested' which of them already have been. This is done
+        once every time the stocklist is replaced, after that only the changed rows are updated, see
+        'update_missing_values'.
+
+        """
+
+        self.missing_values = self.stocklist.isnull().values
+        self.missing_value_columns = list(self.stocklist.columns)
+        self.needs_update = self.get_needs_update(self.stocklist, self.missing_values)
+        self.requested = self.stocklist.index.isin(self.requested_symbols)
+        self.pending_since = np.full(len(self.stocklist.index), time.monotonic())
+        self.prioritized_view = None
+        self.rank_time = None
+
+
+    def update_missing_values(self, symbols: pd.Series) -> None:
+        """ Update the missing values of stocks that have been changed in or appended to the stocklist
+
+        Parameters
+        ----------
+        symbols : pandas.Series
+            The symbols of the changed stocks
+
+        """
+
+        num_indexed = len(self.needs_update)
+        if list(self.stocklist.columns) != self.missing_value_columns or len(self.stocklist.index) < num_indexed:
+            self.index_missing_values()
+            return
+
+        positions = self.stocklist.index.get_indexer(symbols)
+        new_positions = np.arange(num_indexed, len(self.stocklist.index))
+        positions = np.concatenate([positions[positions >= 0], new_positions])
+
+        if new_positions.size > 0:
+            self.missing_values = np.concatenate([self.missing_values,
+                                                  np.zeros((new_positions.size, len(self.missing_value_columns)),
+                                                           dtype=bool)])
+            self.needs_update = np.concatenate([self.needs_update, np.zeros(new_positions.size, dtype=bool)])
+            self.requested = np.concatenate([self.requested, np.zeros(new_positions.size, dtype=bool)])
+            self.pending_since = np.concatenate([self.pending_since, np.full(new_positions.size, time.monotonic())])
+
+        stocks = self.stocklist.iloc[positions]
+        self.missing_values[positions] = stocks.isnull().values
+        self.needs_update[positions] = self.get_needs_update(stocks, self.missing_values[positions])
+        # Changed stocks are only dropped from the priority orders when they are about to be requested
+        if self.needs_update[new_positions].any():
+            self.rank_time = None
+
+
+    def get_needs_update(self, stock_df: pd.DataFrame, missing_values: np.ndarray) -> np.ndarray:
+        """ Stocks with missing values, a symbol and that haven't been updated should be requested """
+
+        if stock_df.empty or "Symbol" not in stock_df.columns or "Updated" not in stock_df.columns:
+            return np.zeros(len(stock_df.index), dtype=bool)
+
+        return (missing_values.any(axis=1) & stock_df["Symbol"].astype(bool).values &
+                ~stock_df["Updated"].astype(bool).values)
 
 
     def get_stocklist(self) -> pd.DataFrame:
@@ -159,6 +387,9 @@ class DataInterface(DataCommon):
                 print("{} Could not convert {} to an integer. Got {} instead. \
                        Will not update stocklist.".format(DATA_INTERFACE_MESSAGE_HEADER, num_stocks, e))
 
+        # Sorting and filtering keep the stocks of this stocklist, the sort orders are computed on it
+        self.unsorted_working_stocklist = self.working_stocklist
+
 
     def sort_working_stocklist(self, sort_variable: str, sort_direction: bool) -> bool:
         """ Sort the currently viewed stocklist
@@ -185,13 +416,21 @@ class DataInterface(DataCommon):
         list_was_sorted = False
         if sort_variable in self.working_stocklist.columns and not self.using_filtered_stocklist:
             print("{} Sorting stocklist based on '{}'.".format(DATA_INTERFACE_MESSAGE_HEADER, sort_variable))
-            self.working_stocklist = self.working_stocklist.sort_values(by=[sort_variable], ascending=sort_direction)
+            self.working_stocklist = self.sort_cache.sort(self.working_stocklist, self.unsorted_working_stocklist,
+                                                          sort_variable, sort_direction)
             list_was_sorted = True
         elif sort_variable in self.filtered_working_stocklist.columns and self.using_filtered_stocklist:
             print("{} Sorting filtered stocklist based on '{}'.".format(DATA_INTERFACE_MESSAGE_HEADER, sort_variable))
-            self.filtered_working_stocklist = self.filtered_working_stocklist.sort_values(by=[sort_variable], ascending=sort_direction)
+            self.filtered_working_stocklist = self.sort_cache.sort(self.filtered_working_stocklist,
+                                                                   self.unsorted_working_stocklist, sort_variable,
+                                                                   sort_direction)
             list_was_sorted = True
 
+        if list_was_sorted:
+            # The stocks that would be shown next in the sorted view are updated first
+            self.priority_column = sort_variable
+            self.priority_ascending = sort_direction
+            self.rank_time = None
 
         return list_was_sorted
 
@@ -221,13 +460,8 @@ class DataInterface(DataCommon):
 
 
     def perform_filtering(self) -> None:
-        self.filtered_working_stocklist = self.working_stocklist.copy()
-        for filter in self.active_filters:
-            column = filter["column"]
-            filter_func = filter["func"]
-            value = filter["val"]
-            rows_to_keep = filter_func(self.filtered_working_stocklist[column], value)
-            self.filtered_working_stocklist = self.filtered_working_stocklist[rows_to_keep]
+        self.filtered_working_stocklist = self.filter_pipeline.apply(self.working_stocklist, self.active_filters,
+                                                                     self.data_version)
 
 
     def update_active_filters(self, new_filter) -> None:
@@ -294,24 +528,18 @@ class DataInterface(DataCommon):
             Dataframe containing all saved data that has been gathered and saved
 
         """
-        data = pd.DataFrame()
-        stock_path = Path.joinpath(TIME_SORTED_DATA, "{}.pkl".format(stock["Symbol"]))
-        if Path.exists(stock_path):
-            data = pd.read_pickle(stock_path)
-        else:
+        data, covered_dates = self.history_cache.read(stock["Symbol"])
+        if data is None:
             data = pd.DataFrame(columns=stock.keys())
-            data.loc[str(date.today())] = stock.values()
-            # Go through all data and find all references to selected stock
-            for folder in Path.iterdir(DATA_FOLDER):
-                for file in folder.iterdir():
-                    if file.stem == STOCKLIST_PICKLE_FILE and folder.stem != date.today():
-                        old_data = pd.read_pickle(file)
-                        old_data = old_data.loc[old_data["Symbol"] == stock["Symbol"]]
-                        if not old_data.empty:
-                            # There should only be one entry in old_data if the symbol exists
-                            data.loc[folder.stem] = old_data.loc[old_data.index[0]]
-
-            data.sort_index(inplace=True)
-            pd.to_pickle(data, stock_path)
+
+        # Only the days that have been added since the history was cached are read
+        missing_days = get_missing_days(covered_dates, self.get_history_days())
+        if missing_days:
+            old_data = self.read_stock_history(stock["Symbol"], list(data.columns), missing_days)
+            data = append_days(data, old_data, missing_days)
+            self.history_cache.write(stock["Symbol"], data, covered_dates | set(missing_days))
+
+        data.loc[str(date.today())] = pd.Series(stock)
+        data.sort_index(inplace=True)
 
         return data
@@ -1,3 +1,5 @@
+import os
+
 from datetime import date
 from pathlib import Path
 from enum import Enum
@@ -5,11 +7,26 @@ from enum import Enum
 DATA_FOLDER = Path("Database")
 CURRENT_DATA_FOLDER = Path.joinpath(DATA_FOLDER, "{}".format(date.today()))
 TIME_SORTED_DATA = Path.joinpath(DATA_FOLDER, "StockDataOverTime")
+HISTORY_FOLDER = Path.joinpath(DATA_FOLDER, "History")
+HISTORY_INDEX_FILE = "HistoryIndex.json"
+CACHE_FOLDER = Path.joinpath(DATA_FOLDER, "Cache")
+HTTP_CACHE_FOLDER = Path.joinpath(CACHE_FOLDER, "HttpCache")
+SYMBOL_NAME_FILE = Path.joinpath(CACHE_FOLDER, "SymbolNames.pkl")
 STOCKLIST_PICKLE_FILE = "CompleteStocklist"
+# Name of the index of a stocklist in memory, it holds the symbols but must differ from the "Symbol" column
+SYMBOL_INDEX_NAME = "Ticker"
+# Dtypes of the stocklist columns, see 'apply_stocklist_schema' in DataCommon.py. Text columns with few distinct
+# values are categoricals and volumes are nullable integers. The symbol stays a plain string, it is used for lookups.
+STOCKLIST_CATEGORY_COLUMNS = ["Sector", "Industry", "Direction", "Sentiment"]
+STOCKLIST_INTEGER_COLUMNS = {"Volume": "Int64", "Avg Vol (3 month)": "Int64"}
+MOMENTUM_TABLE_FILE = "TwitterMomentum"
+STOCKLIST_DELTA_LOG_FILE = "CompleteStocklistDeltas"
+STOCKLIST_MANIFEST_FILE = "CompleteStocklistManifest.json"
 DATA_INTERFACE_MESSAGE_HEADER = "@DI:"
 DATA_GATHERER_MESSAGE_HEADER = "@DG:"
 DATA_COMMON_MESSAGE_HEADER = "@DC:"
 GUI_MESSAGE_HEADER = "@GUI:"
+DATA_WRITER_MESSAGE_HEADER = "@DW:"
 
 # Stocklist definitions
 stocklist_enum = Enum("Stocklists",
@@ -18,7 +35,99 @@ stocklist_enum = Enum("Stocklists",
                  "TwitterBullBear " +
                  "TwitterMomentum")
 
+# Seconds to wait for all stocklists to be fetched during startup, sources that are slower than this are skipped
+STOCKLIST_FETCH_TIMEOUT = 60
+
+# Number of stocks in every UpdateRequest
 ENOUGH_STOCKS_UPDATED_TO_SIGNAL = 5
+# Number of processes that enrich stocks, their results are written by a single writer process
+NUMBER_OF_GATHERER_WORKERS = 2
+# Maximum number of stocks that the EnrichmentEngine enriches at the same time
+MAX_CONCURRENT_ENRICHMENTS = 10
+# Maximum number of UpdateRequests that a worker handles at the same time
+MAX_REQUESTS_PER_WORKER = 2
+# Maximum number of UpdateRequests that the DataInterface has waiting for a reply, enough to keep every worker busy
+MAX_PENDING_UPDATE_REQUESTS = MAX_REQUESTS_PER_WORKER * NUMBER_OF_GATHERER_WORKERS
+# Seconds to block while waiting for a message in the queue
+QUEUE_POLL_TIMEOUT = 0.5
+# Stocks that aren't shown in the GUI are updated in order of this column, unless the view is sorted on another one
+UPDATE_PRIORITY_COLUMN = "Volume"
+# Seconds that a stock has to wait for an update to be ranked as high as the most important one, and how often the
+# waiting stocks are ranked again
+UPDATE_PRIORITY_MAX_AGE = 10 * 60
+UPDATE_PRIORITY_RANK_INTERVAL = 30
+
+# Parser used for the tables on scraped webpages, one of "lxml", "strained" or "bs4", see TableParser.py
+HTML_PARSER_BACKEND = "lxml"
+
+# Text filters are evaluated once per distinct value of a column if the first FILTER_DISTINCT_SAMPLE_SIZE rows have
+# at most this ratio of distinct values, see FilterPipeline.py
+FILTER_MAX_DISTINCT_RATIO = 0.5
+FILTER_DISTINCT_SAMPLE_SIZE = 1000
+# Columns that the text filters search through an index of their texts, see TextIndex.py
+TEXT_INDEX_COLUMNS = ["Name", "Sector", "Industry"]
+
+# Format of the stocklist files in the day folders, "feather", "parquet" or "pickle", see StocklistStorage.py
+STOCKLIST_STORAGE_BACKEND = "feather"
+# Number of versions of a stocklist that are kept on disk, and times to retry a read if a version was removed
+STOCKLIST_VERSIONS_TO_KEEP = 2
+STOCKLIST_READ_ATTEMPTS = 3
+# The delta log of the stocklist is compacted when it is larger than this many bytes, or its oldest entry is older
+# than this many seconds, see DeltaLog.py
+DELTA_LOG_MAX_SIZE = 1024 * 1024
+DELTA_LOG_MAX_AGE = 10 * 60
+
+# The writer publishes its stocklist in shared memory when it is idle, and at least this often in seconds while it is
+# busy, see SharedSnapshot.py
+SNAPSHOT_PUBLISH_INTERVAL = 5
+SHARED_SNAPSHOT_PREFIX = "stockscreener"
+SHARED_SNAPSHOT_READ_ATTEMPTS = 3
+# String columns with more distinct values than this share of the rows are pickled instead of dictionary encoded
+SHARED_SNAPSHOT_MAX_DISTINCT_RATIO = 0.5
+
+# Symbol name definitions
+SYMBOL_NAME_FLUSH_INTERVAL = 20
+# Seconds before a symbol whose name couldn't be found is looked up again
+SYMBOL_NAME_FAILED_EXPIRY = 24 * 60 * 60
+
+# Number of tradefollowers pages to harvest before the momentum table is written to disk
+MOMENTUM_TABLE_FLUSH_INTERVAL = 10
+
+# HTTP definitions
+# Seconds to wait for a connection, between two reads and for a complete request
+HTTP_CONNECT_TIMEOUT = 5
+HTTP_READ_TIMEOUT = 15
+HTTP_REQUEST_DEADLINE = 30
+# Bytes read from the body at a time, the deadline is checked between two reads
+HTTP_READ_CHUNK_SIZE = 1024
+# Throttled or failed requests are retried with an exponential backoff, in seconds
+HTTP_MAX_RETRIES = 3
+HTTP_BACKOFF_BASE = 0.5
+HTTP_BACKOFF_MAX = 30
+# Requests per second to each host, the rate adapts between the min and max values depending on throttling
+HTTP_DEFAULT_RATE = 5
+HTTP_MIN_RATE = 0.2
+HTTP_MAX_RATE = 20
+HTTP_BURST_SIZE = 5
+HTTP_RATE_INCREASE = 0.1
+HTTP_RATE_DECREASE = 0.5
+HTTP_DEFAULT_POOL_SIZE = 4
+# Maximum number of simultaneous requests to a single host
+HTTP_MAX_REQUESTS_PER_HOST = 4
+# Number of keep-alive connections to keep open to the hosts that are scraped the most
+HTTP_POOL_SIZES = {"www.tradefollowers.com": 10,
+                   "finance.yahoo.com": 10,
+                   "www.marketwatch.com": 10,
+                   "www.sentdex.com": 4}
+# Seconds that a cached webpage is considered fresh, per host
+HTTP_CACHE_DEFAULT_TTL = 60 * 60
+HTTP_CACHE_TTL = {"www.tradefollowers.com": 6 * 60 * 60,
+                  "www.sentdex.com": 12 * 60 * 60,
+                  "finance.yahoo.com": 24 * 60 * 60,
+                  "www.marketwatch.com": 24 * 60 * 60}
+HTTP_CACHE_MAX_SIZE = 500 * 1024 * 1024
+# In offline mode only cached webpages are used, set the environment variable STOCKSCREENER_OFFLINE=1 to enable it
+HTTP_OFFLINE_MODE = os.environ.get("STOCKSCREENER_OFFLINE", "0") == "1"
 
 # GUI Definitions
 NUMBER_OF_OPTION_FRAMES = 10
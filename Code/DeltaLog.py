@@ -0,0 +1,101 @@
+import json
+import pandas as pd
+import time
+
+from pathlib import Path
+from typing import List
+
+from Definitions import *
+
+
+class DeltaLog():
+    """ Append-only log of the stocks that have been updated since the stocklist of a day folder was written
+
+    Description
+    -----------
+    Writing the complete stocklist every time a few stocks have been enriched means that the whole file is written
+    hundreds of times a day. Instead the updated stocks are appended to this log, one JSON record per stock and line,
+    and the stocklist file is only rewritten when the log is compacted. Every version of the stocklist has its own
+    log, named in the manifest of the day folder, so compacting means writing a new version of the stocklist which
+    starts with an empty log. A reader gets the current data by applying the log to the stocklist, see
+    'DataCommon.read_stocklist'.
+
+    The log should be compacted once 'needs_compaction' returns True, which happens when it has grown past
+    DELTA_LOG_MAX_SIZE bytes or the oldest entry is older than DELTA_LOG_MAX_AGE seconds. A line that was only partly
+    written, e.g. because the process was killed, is skipped when the log is read.
+
+    Attributes
+    ----------
+    path : pathlib.Path
+        The file where the log is stored
+    first_append_time : float
+        Time when the first entry since the last compaction was appended, None if the log is empty
+
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.first_append_time = time.monotonic() if self.exists() else None
+
+
+    def exists(self) -> bool:
+        return self.path.exists() and self.path.stat().st_size > 0
+
+
+    def append(self, stock_df: pd.DataFrame) -> None:
+        """ Append updated stocks to the log, only the values that aren't null are stored """
+
+        records = [{col: value for col, value in record.items() if pd.notna(value)}
+                   for record in json.loads(stock_df.to_json(orient="records"))]
+        with open(self.path, "a") as log_file:
+            log_file.write("".join("{}\n".format(json.dumps(record)) for record in records))
+
+        if self.first_append_time is None:
+            self.first_append_time = time.monotonic()
+
+
+    def read(self, columns: List[str] = None) -> pd.DataFrame:
+        """ Read the log
+
+        Parameters
+        ----------
+        columns : List[str]
+            Optional, only these columns are returned
+
+        Returns
+        -------
+        pandas.DataFrame
+            One row per updated stock with the latest value of every column that has been set, an empty dataframe if
+            the log is empty
+
+        """
+
+        if not self.exists():
+            return pd.DataFrame()
+
+        records = []
+        with open(self.path, "r") as log_file:
+            for line in log_file:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    print("{} Skipping a broken line in {}.".format(DATA_COMMON_MESSAGE_HEADER, self.path))
+
+        stock_df = pd.DataFrame.from_records(records)
+        if stock_df.empty or "Symbol" not in stock_df.columns:
+            return pd.DataFrame()
+
+        if columns is not None:
+            stock_df = stock_df[[col for col in stock_df.columns if col in columns or col == "Symbol"]]
+
+        # The last value that was set for every column, a later entry without a value doesn't remove it
+        return stock_df.groupby("Symbol", sort=False).last().reset_index()
+
+
+    def needs_compaction(self) -> bool:
+        if self.first_append_time is None:
+            return False
+
+        return (self.path.stat().st_size >= DELTA_LOG_MAX_SIZE or
+                time.monotonic() - self.first_append_time >= DELTA_LOG_MAX_AGE)
+
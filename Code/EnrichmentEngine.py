@@ -0,0 +1,129 @@
+import asyncio
+import os
+import pandas as pd
+
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+from queue import Empty
+
+from Definitions import *
+from Messages import UpdateRequest, UpdateResult, WorkItem
+
+
+class EnrichmentEngine():
+    """ Handles the UpdateRequests sent to the DataGatherer concurrently
+
+    Description
+    -----------
+    Runs in each of the NUMBER_OF_GATHERER_WORKERS worker processes, which all read from the same queue. UpdateRequests
+    are read from the queue as they arrive, at most MAX_REQUESTS_PER_WORKER at a time, and every stock in them is
+    enriched in its own task, with at most MAX_CONCURRENT_ENRICHMENTS stocks being enriched at once. The actual
+    fetching is done by 'DataGatherer.enrich_stock' in a thread pool, the number of simultaneous requests to each host
+    is limited by the WebSession.
+
+    The enriched stocks are not written by the workers. When all stocks in a request are done an UpdateResult is put
+    in the writer queue and written by 'DataGatherer.write_worker_results' in a single process. A stock that is
+    already being enriched by another worker is left out of the result.
+
+    Attributes
+    ----------
+    data_gatherer : DataGatherer
+        The DataGatherer used to enrich the stocks
+    stocks_in_progress : dict
+        Shared between all workers, maps the symbol of every stock that is being enriched to the worker handling it
+    max_concurrent_stocks : int
+        Maximum number of stocks that are enriched at the same time
+
+    """
+
+    def __init__(self, data_gatherer, stocks_in_progress: dict, max_concurrent_stocks: int = MAX_CONCURRENT_ENRICHMENTS):
+        self.data_gatherer = data_gatherer
+        self.stocks_in_progress = stocks_in_progress
+        self.max_concurrent_stocks = max_concurrent_stocks
+        self.task_ids = count()
+        self.fetch_executor = ThreadPoolExecutor(max_workers=max_concurrent_stocks)
+        # Reading the queue blocks, so it gets its own thread to keep the loop responsive
+        self.queue_executor = ThreadPoolExecutor(max_workers=1)
+        self.concurrency_limit = None
+        self.request_limit = None
+
+
+    def run(self) -> None:
+        """ Handle messages until the process is stopped """
+
+        asyncio.run(self.process_messages())
+
+
+    async def process_messages(self) -> None:
+        loop = asyncio.get_running_loop()
+        self.concurrency_limit = asyncio.Semaphore(self.max_concurrent_stocks)
+        self.request_limit = asyncio.Semaphore(MAX_REQUESTS_PER_WORKER)
+        tasks = set()
+
+        while True:
+            # Wait for a free slot before taking the next request so that the queue works as backpressure
+            await self.request_limit.acquire()
+            request = await loop.run_in_executor(self.queue_executor, self.get_message)
+            if not isinstance(request, UpdateRequest):
+                self.request_limit.release()
+                if request is None and not tasks:
+                    self.data_gatherer.flush_stores()
+                continue
+
+            task = asyncio.create_task(self.handle_request(request))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+
+    async def handle_request(self, request: UpdateRequest) -> None:
+        """ Enrich all stocks in a request and hand the result to the writer """
+
+        try:
+            stocks = await asyncio.gather(*[self.enrich(item) for item in request.items])
+            result = UpdateResult(request.request_id, self.data_gatherer.combine_enriched_stocks(stocks))
+            self.data_gatherer.queue[DATA_WRITER_MESSAGE_HEADER].put(result)
+        finally:
+            self.request_limit.release()
+
+
+    def get_message(self) -> str:
+        """ Wait for a message in the queue, returns None if no message arrived within QUEUE_POLL_TIMEOUT seconds """
+
+        try:
+            return self.data_gatherer.queue[DATA_GATHERER_MESSAGE_HEADER].get(timeout=QUEUE_POLL_TIMEOUT)
+        except Empty:
+            return None
+
+
+    async def enrich(self, item: WorkItem) -> pd.DataFrame:
+        """ Enrich one stock
+
+        Parameters
+        ----------
+        item : WorkItem
+            The stock to update and its columns with missing data
+
+        Returns
+        -------
+        pandas.DataFrame
+            The enriched stock, None if another worker is already enriching it
+
+        """
+
+        loop = asyncio.get_running_loop()
+        task_id = (os.getpid(), next(self.task_ids))
+        stock_data = None
+        async with self.concurrency_limit:
+            try:
+                if self.stocks_in_progress.setdefault(item.symbol, task_id) == task_id:
+                    stock_data = await loop.run_in_executor(self.fetch_executor, self.data_gatherer.enrich_stock, item)
+                    self.stocks_in_progress.pop(item.symbol, None)
+                else:
+                    print("{} {} is already being updated.".format(DATA_GATHERER_MESSAGE_HEADER, item.symbol))
+            except Exception as e:
+                print("{} Failed to enrich {}, got {}".format(DATA_GATHERER_MESSAGE_HEADER, item.symbol, e))
+                self.stocks_in_progress.pop(item.symbol, None)
+                # The stock is still marked as updated so that it isn't requested again
+                stock_data = pd.DataFrame({"Symbol": [item.symbol], "Updated": [True]})
+
+        return stock_data
@@ -0,0 +1,199 @@
+import numpy as np
+import pandas as pd
+
+from numbers import Number
+from typing import List
+
+from DataCommon import (cell_contains, cell_does_not_contain, cell_greater_than, cell_greater_than_or_equal,
+                        cell_less_than, cell_less_than_or_equal, cell_num_equals, cell_num_not_equals,
+                        cell_string_equals, cell_string_not_equals)
+from Definitions import *
+from TextIndex import ColumnTextIndex, TextIndex
+
+try:
+    import numexpr
+    NUMEXPR_AVAILABLE = True
+except ImportError:
+    NUMEXPR_AVAILABLE = False
+
+
+# The filter functions that compare numbers, and the operator they use
+NUMERIC_COMPARISONS = {cell_greater_than: ">",
+                       cell_greater_than_or_equal: ">=",
+                       cell_less_than: "<",
+                       cell_less_than_or_equal: "<=",
+                       cell_num_equals: "==",
+                       cell_num_not_equals: "!="}
+NUMPY_OPERATORS = {">": np.greater, ">=": np.greater_equal, "<": np.less, "<=": np.less_equal, "==": np.equal,
+                   "!=": np.not_equal}
+# The filter functions that can search a text column through its TextIndex
+TEXT_SEARCHES = [cell_contains, cell_does_not_contain, cell_string_equals, cell_string_not_equals]
+
+
+class FilterPipeline():
+    """ Combines the masks of the active filters of the DataInterface into a single mask
+
+    Description
+    -----------
+    Filtering used to apply the filters one at a time, creating a new filtered stocklist after every filter. The
+    pipeline instead combines the masks of all filters and selects the rows once at the end. Only the columns that
+    the filters use are read.
+
+    The mask of every filter is cached, keyed on the column, filter function and value of the filter. The cache
+    belongs to one stocklist and data version and is cleared when filtering another stocklist or newer data, so
+    adding a filter only evaluates the new filter and removing or editing one only combines the cached masks again.
+
+    Comparisons of a numeric column with a number are done directly on the values of the column, with numexpr if it
+    is installed so that no temporary arrays are needed, otherwise with numpy. A missing value only passes the "not
+    equal to" comparison, like with the filter functions.
+
+    The other filters, e.g. the text filters, call their filter function. For a text column with few distinct
+    values, like the sector, the function is called with every distinct value once and the result is spread out to
+    the rows. The columns in TEXT_INDEX_COLUMNS, like the name, are instead searched through a TextIndex, which is
+    kept between data versions and only has to index the texts that are new. The rows of a column are mapped to the
+    texts of the index once per stocklist and data version.
+
+    Attributes
+    ----------
+    masks : dict
+        The cached masks of the filters
+    stocklist : pandas.DataFrame
+        The stocklist that the masks belong to
+    data_version : int
+        Version of the data that the masks belong to
+    text_indexes : dict
+        The TextIndex of every column in TEXT_INDEX_COLUMNS
+    column_text_indexes : dict
+        The ColumnTextIndex of the columns of the stocklist that have been searched
+
+    """
+
+    def __init__(self):
+        self.masks = {}
+        self.stocklist = None
+        self.data_version = None
+        self.text_indexes = {column: TextIndex() for column in TEXT_INDEX_COLUMNS}
+        self.column_text_indexes = {}
+
+
+    def apply(self, stock_df: pd.DataFrame, filters: List[dict], data_version: int = None) -> pd.DataFrame:
+        """ Get the rows of a stocklist that pass all filters
+
+        Parameters
+        ----------
+        stock_df : pandas.DataFrame
+            The stocklist to filter
+        filters : List[dict]
+            The filters, with the same keys as the active filters of the DataInterface
+        data_version : int
+            Optional, version of the data in the stocklist
+
+        Returns
+        -------
+        pandas.DataFrame
+            The filtered stocklist
+
+        """
+
+        if not filters:
+            return stock_df.copy()
+
+        return stock_df.iloc[np.flatnonzero(self.get_mask(stock_df, filters, data_version))]
+
+
+    def get_mask(self, stock_df: pd.DataFrame, filters: List[dict], data_version: int = None) -> np.ndarray:
+        """ Get a boolean array telling which rows of a stocklist pass all filters """
+
+        if stock_df is not self.stocklist or data_version != self.data_version:
+            self.masks = {}
+            self.column_text_indexes = {}
+            self.stocklist = stock_df
+            self.data_version = data_version
+
+        masks = {}
+        for filter in filters:
+            key = get_filter_key(filter)
+            if key not in masks:
+                masks[key] = self.masks[key] if key in self.masks else self.get_filter_mask(filter, stock_df)
+
+        # Masks of filters that have been removed are dropped
+        self.masks = masks
+        mask = np.ones(len(stock_df.index), dtype=bool)
+        for filter_mask in masks.values():
+            mask &= filter_mask
+
+        return mask
+
+
+    def get_filter_mask(self, filter: dict, stock_df: pd.DataFrame) -> np.ndarray:
+        column = stock_df[filter["column"]]
+        operator = self.get_numeric_operator(filter, column)
+        if operator is None:
+            return self.call_filter_function(filter, column)
+
+        values = column.to_numpy(dtype=np.float64, na_value=np.nan)
+        if NUMEXPR_AVAILABLE:
+            return numexpr.evaluate("values {} value".format(operator),
+                                    local_dict={"values": values, "value": np.float64(filter["val"])})
+
+        return NUMPY_OPERATORS[operator](values, filter["val"])
+
+
+    def call_filter_function(self, filter: dict, column: pd.Series) -> np.ndarray:
+        """ Get the mask of a filter from its filter function, called once per distinct value if they are few """
+
+        if filter["func"] in TEXT_SEARCHES and column.name in self.text_indexes:
+            column_text_index = self.get_column_text_index(column)
+            return np.asarray(filter["func"](column, filter["val"], column_text_index), dtype=bool)
+        elif isinstance(column.dtype, pd.CategoricalDtype):
+            codes, distinct_values = column.cat.codes.values, column.cat.categories.values.astype(object)
+        elif column.dtype == object and self.has_few_distinct_values(column):
+            codes, distinct_values = pd.factorize(column)
+        else:
+            return np.asarray(filter["func"](column, filter["val"]), dtype=bool)
+
+        distinct_mask = np.asarray(filter["func"](pd.Series(distinct_values, dtype=object), filter["val"]), dtype=bool)
+        if (codes == -1).any():
+            # Missing values have the code -1, which picks the last entry
+            distinct_mask = np.append(distinct_mask, self.get_missing_value_mask(filter))
+
+        return distinct_mask[codes]
+
+
+    def get_missing_value_mask(self, filter: dict) -> bool:
+        """ Check if a missing value passes a filter, it doesn't if the filter function can't handle it """
+
+        try:
+            return bool(np.asarray(filter["func"](pd.Series([np.nan], dtype=object), filter["val"]), dtype=bool)[0])
+        except TypeError:
+            return False
+
+
+    def get_column_text_index(self, column: pd.Series) -> ColumnTextIndex:
+        if column.name not in self.column_text_indexes:
+            self.column_text_indexes[column.name] = self.text_indexes[column.name].index_column(column)
+
+        return self.column_text_indexes[column.name]
+
+
+    def has_few_distinct_values(self, column: pd.Series) -> bool:
+        sample = column.values[:FILTER_DISTINCT_SAMPLE_SIZE]
+        return len(pd.unique(sample)) <= len(sample) * FILTER_MAX_DISTINCT_RATIO
+
+
+    def get_numeric_operator(self, filter: dict, column: pd.Series) -> str:
+        """ Get the operator of a filter that compares a numeric column with a number, None for other filters """
+
+        operator = NUMERIC_COMPARISONS.get(filter["func"])
+        value = filter["val"]
+        if (operator is None or column.dtype.kind not in "iuf" or not isinstance(value, Number) or
+                isinstance(value, bool)):
+            return None
+
+        return operator
+
+
+def get_filter_key(filter: dict) -> tuple:
+    """ Filters with the same column, filter function and value have the same mask """
+
+    return (filter["column"], filter["func"], filter["val"])
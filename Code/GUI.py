@@ -14,11 +14,11 @@ from Definitions import GUI_MESSAGE_HEADER, NUMBER_OF_OPTION_FRAMES
 
 
 class GUI(Frame):
-    def __init__(self, root, event, lock, queue):
+    def __init__(self, root, event, lock, queue, snapshot_directory=None):
         print("{} GUI is waiting for data gatherer...".format(GUI_MESSAGE_HEADER))
         event.wait()
         print("{} Data gatherer has finished: {}, starting GUI!".format(GUI_MESSAGE_HEADER, event.is_set()))
-        self.data_interface = DataInterface(lock, queue)
+        self.data_interface = DataInterface(lock, queue, snapshot_directory)
         self.id = 0
         self.num_stocks = "10"
         self.root = root
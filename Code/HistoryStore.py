@@ -0,0 +1,191 @@
+import json
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+from typing import List
+
+from Definitions import *
+from StocklistStorage import ParquetStorage
+
+try:
+    import pyarrow.feather as feather
+    HISTORY_STORE_AVAILABLE = True
+except ImportError:
+    HISTORY_STORE_AVAILABLE = False
+
+
+class HistoryStore():
+    """ The stocklists of all days in one store, indexed on symbol
+
+    Description
+    -----------
+    Getting the history of a stock used to mean reading the complete stocklist of every day folder to find one row in
+    each. The store keeps a copy of the stocklist of every day as a partition in HISTORY_FOLDER, an uncompressed
+    Feather file sorted on symbol. The partitions are memory mapped and the row of a stock is found with a binary
+    search on the symbols, so getting the history of a stock only reads the rows of that stock and a few symbols per
+    day.
+
+    A day is added with 'add_day' every time a new version of its stocklist is written. Like the stocklists, the
+    partitions are never changed once written. A new partition is written for every version and the index, which
+    names the partition of every day, is replaced atomically after it. The partitions of the STOCKLIST_VERSIONS_TO_KEEP
+    latest versions of a day are kept for readers that read the index just before a write. The index is cached in
+    memory and only read again when the file has changed.
+
+    Attributes
+    ----------
+    folder : pathlib.Path
+        The folder where the partitions and the index are stored
+    index : dict
+        Maps the date of every stored day to the file and version of its partition
+
+    """
+
+    def __init__(self, folder: Path = HISTORY_FOLDER):
+        self.folder = folder
+        self.index_path = Path.joinpath(folder, HISTORY_INDEX_FILE)
+        self.index = {}
+        self.index_mtime = None
+        self.storage = ParquetStorage()
+
+
+    def read_index(self) -> dict:
+        """ Get the index, it is only read from disk if the file has changed since it was last read """
+
+        try:
+            mtime = self.index_path.stat().st_mtime_ns
+            if mtime != self.index_mtime:
+                with open(self.index_path, "r") as index_file:
+                    self.index = json.load(index_file)
+                self.index_mtime = mtime
+        except (OSError, ValueError):
+            pass
+
+        return self.index
+
+
+    def get_version(self, day: str) -> int:
+        """ Get the version of the stocklist that the partition of a day was made from, None if the day isn't stored """
+
+        partition = self.read_index().get(day)
+        return partition["version"] if partition else None
+
+
+    def add_day(self, day: str, stock_df: pd.DataFrame, version: int) -> None:
+        """ Add or replace the partition of a day
+
+        To use this function the user must first acquire the file lock.
+
+        Parameters
+        ----------
+        day : str
+            The date of the stocklist, the name of its day folder
+        stock_df : pandas.DataFrame
+            The stocklist of the day
+        version : int
+            Version of the stocklist, see StocklistStorage
+
+        """
+
+        self.folder.mkdir(parents=True, exist_ok=True)
+        stock_df = stock_df[stock_df["Symbol"].map(lambda symbol: isinstance(symbol, str))]
+        stock_df = self.storage.prepare_columns(stock_df.sort_values("Symbol").reset_index(drop=True))
+
+        file_name = "{}.{}.feather".format(day, version)
+        self.storage.replace_file(Path.joinpath(self.folder, file_name),
+                                  lambda temp_path: feather.write_feather(stock_df, temp_path,
+                                                                          compression="uncompressed"))
+
+        index = dict(self.read_index())
+        index[day] = {"file": file_name, "version": version}
+        self.storage.replace_file(self.index_path, lambda temp_path: temp_path.write_text(json.dumps(index)))
+        self.remove_old_partitions(day, version)
+
+
+    def get_history(self, symbol: str, columns: List[str] = None, days: List[str] = None) -> pd.DataFrame:
+        """ Get the stored rows of a stock
+
+        Parameters
+        ----------
+        symbol : str
+            Ticker symbol for the stock
+        columns : List[str]
+            Optional, only these columns are returned
+        days : List[str]
+            Optional, only these days are read
+
+        Returns
+        -------
+        pandas.DataFrame
+            One row per day that the stock exists in, indexed on the date
+
+        """
+
+        index = self.read_index()
+        found_days = []
+        rows = []
+        for day in index if days is None else days:
+            partition = self.open_partition(day, index)
+            if partition is None:
+                continue
+
+            row = find_symbol(partition.column("Symbol"), symbol)
+            if row is None:
+                continue
+
+            if columns is not None:
+                partition = partition.select([col for col in columns if col in partition.schema.names])
+            found_days.append(day)
+            rows.extend(partition.slice(row, 1).to_pylist())
+
+        if not rows:
+            return pd.DataFrame(columns=columns)
+
+        # The columns can differ between the days, a column that is missing a day is left empty
+        return pd.DataFrame.from_records(rows, index=found_days).fillna(np.nan).sort_index()
+
+
+    def read_day(self, day: str, columns: List[str] = None) -> pd.DataFrame:
+        """ Read the stored stocklist of a day, None if the day isn't stored """
+
+        partition = self.open_partition(day, self.read_index())
+        if partition is None:
+            return None
+
+        if columns is not None:
+            partition = partition.select([col for col in columns if col in partition.schema.names])
+
+        return partition.to_pandas(use_threads=False)
+
+
+    def open_partition(self, day: str, index: dict):
+        """ Memory map the partition of a day, None if it isn't stored """
+
+        try:
+            return feather.read_table(Path.joinpath(self.folder, index[day]["file"]), memory_map=True)
+        except (OSError, KeyError):
+            return None
+
+
+    def remove_old_partitions(self, day: str, version: int) -> None:
+        for path in self.folder.glob("{}.*.feather".format(day)):
+            file_version = path.name[len(day) + 1:].split(".")[0]
+            if file_version.isdigit() and int(file_version) <= version - STOCKLIST_VERSIONS_TO_KEEP:
+                try:
+                    path.unlink()
+                except OSError as e:
+                    print("{} Failed to remove {}, got {}".format(DATA_COMMON_MESSAGE_HEADER, path, e))
+
+
+def find_symbol(symbols, symbol: str) -> int:
+    """ Binary search for a symbol in the sorted symbol column of a partition, returns its row or None """
+
+    low, high = 0, len(symbols)
+    while low < high:
+        middle = (low + high) // 2
+        if symbols[middle].as_py() < symbol:
+            low = middle + 1
+        else:
+            high = middle
+
+    return low if low < len(symbols) and symbols[low].as_py() == symbol else None
@@ -0,0 +1,78 @@
+import pandas as pd
+
+from dataclasses import dataclass, field
+from typing import List
+
+
+@dataclass
+class WorkItem:
+    """ A stock that the DataInterface wants more data for
+
+    Attributes
+    ----------
+    symbol : str
+        Ticker symbol for the stock
+    missing_columns : List[str]
+        Names of the columns with null or nan values
+
+    """
+
+    symbol: str
+    missing_columns: List[str]
+
+
+@dataclass
+class UpdateRequest:
+    """ Sent from the DataInterface to the DataGatherer workers, asks for a batch of stocks to be updated
+
+    Attributes
+    ----------
+    request_id : int
+        Identifies the request, the reply has the same id
+    items : List[WorkItem]
+        The stocks to update
+
+    """
+
+    request_id: int
+    items: List[WorkItem] = field(default_factory=list)
+
+
+@dataclass
+class UpdateResult:
+    """ Sent from a DataGatherer worker to the writer when all stocks in an UpdateRequest have been handled
+
+    Attributes
+    ----------
+    request_id : int
+        The id of the UpdateRequest
+    stocks : pandas.DataFrame
+        One row for every stock that was updated, only the columns that were looked for are set
+
+    """
+
+    request_id: int
+    stocks: pd.DataFrame
+
+
+@dataclass
+class UpdateReply:
+    """ Sent from the writer to the DataInterface once the result of an UpdateRequest has been written
+
+    Attributes
+    ----------
+    request_id : int
+        The id of the UpdateRequest
+    stocks : pandas.DataFrame
+        The rows that were changed, can be merged into the stocklist without reading the datafile
+    version : int
+        Version of the data once the stocks have been stored, increased by one for every reply
+    failed : bool
+        True if the result couldn't be stored, the stocks of the request can be requested again
+
+    """
+
+    request_id: int
+    stocks: pd.DataFrame
+    version: int = None
+    failed: bool = False
@@ -0,0 +1,111 @@
+import numpy as np
+import os
+import pickle
+import threading
+
+from pathlib import Path
+from typing import Optional
+
+from Definitions import *
+
+
+class MomentumTable():
+    """ Daily table with 1 and 7 day twitter momentum for every stock seen on tradefollowers
+
+    Description
+    -----------
+    Every stock_list page on tradefollowers contains momentum data for several stocks. Instead of only keeping the
+    row for the stock that was searched for, all rows are stored here so that later requests for those stocks can be
+    answered without fetching anything. A stock that was searched for but wasn't on the page is stored with NaN
+    values. The table is stored in the folder of the current day, and written to disk in batches of
+    MOMENTUM_TABLE_FLUSH_INTERVAL pages, or when 'flush' is called.
+
+    Attributes
+    ----------
+    path : pathlib.Path
+        The file where the table is stored
+    momentum : dict
+        Maps a symbol to a dict with the columns 'Twit_1d_Mom' and 'Twit_7d_Mom'
+    unsaved_pages : int
+        Number of pages that have been added since the table was written to disk
+
+    """
+
+    def __init__(self, path: Path = Path.joinpath(CURRENT_DATA_FOLDER, "{}.pkl".format(MOMENTUM_TABLE_FILE))):
+        self.path = path
+        self.unsaved_pages = 0
+        self.table_lock = threading.Lock()
+        self.momentum = self.read_table()
+
+
+    def read_table(self) -> dict:
+        try:
+            with open(self.path, "rb") as table_file:
+                return pickle.load(table_file)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return {}
+
+
+    def get(self, symbol: str) -> Optional[dict]:
+        """ Get the momentum data for a stock
+
+        Parameters
+        ----------
+        symbol : str
+            Ticker symbol for the stock
+
+        Returns
+        -------
+        Optional[dict]
+            A dict with the columns 'Twit_1d_Mom' and 'Twit_7d_Mom', None if the stock hasn't been seen today
+
+        """
+
+        with self.table_lock:
+            return self.momentum.get(symbol)
+
+
+    def add_page(self, rows: dict) -> None:
+        """ Add all rows that were found on one page
+
+        Parameters
+        ----------
+        rows : dict
+            Maps a symbol to a dict with the columns 'Twit_1d_Mom' and 'Twit_7d_Mom'
+
+        """
+
+        with self.table_lock:
+            for symbol, data in rows.items():
+                # Don't let a page without data for a stock overwrite data found on another page
+                if symbol not in self.momentum or not np.isnan(data["Twit_1d_Mom"]):
+                    self.momentum[symbol] = data
+
+            self.unsaved_pages += 1
+            flush_table = self.unsaved_pages >= MOMENTUM_TABLE_FLUSH_INTERVAL
+
+        if flush_table:
+            self.flush()
+
+
+    def flush(self) -> None:
+        """ Write the table to disk, rows added by other processes are kept """
+
+        with self.table_lock:
+            if self.unsaved_pages == 0:
+                return
+
+            momentum = self.read_table()
+            momentum.update(self.momentum)
+
+            try:
+                Path.mkdir(self.path.parent, parents=True, exist_ok=True)
+                temp_path = self.path.with_suffix(".{}.tmp".format(os.getpid()))
+                with open(temp_path, "wb") as table_file:
+                    pickle.dump(momentum, table_file)
+                os.replace(temp_path, self.path)
+
+                self.momentum = momentum
+                self.unsaved_pages = 0
+            except OSError as e:
+                print("{} Failed to write momentum table, got {}".format(DATA_GATHERER_MESSAGE_HEADER, e))
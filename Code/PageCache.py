@@ -0,0 +1,154 @@
+import hashlib
+import os
+import pickle
+import time
+
+from pathlib import Path
+from typing import Optional
+from urllib.parse import urlsplit
+
+from Definitions import *
+
+
+class PageCache():
+    """ On-disk cache for scraped webpages
+
+    Description
+    -----------
+    Stores the content of fetched webpages under HTTP_CACHE_FOLDER with one file per url. A cached page is considered
+    fresh for the number of seconds given for its host in HTTP_CACHE_TTL (HTTP_CACHE_DEFAULT_TTL for other hosts),
+    which means that restarting the application during the day replays the cached pages instead of fetching them
+    again. The total size of the cache is kept below HTTP_CACHE_MAX_SIZE by removing the least recently used pages.
+
+    In offline mode every cached page is returned no matter how old it is and nothing is ever fetched, which makes it
+    possible to run the application without a network connection.
+
+    Attributes
+    ----------
+    folder : pathlib.Path
+        The folder where pages are stored
+    max_size : int
+        Maximum size of the cache in bytes
+    offline : bool
+        If True, stale pages are returned as well
+    hits : int
+        Number of pages that were found in the cache
+    misses : int
+        Number of pages that were not found in the cache or were too old
+
+    """
+
+    def __init__(self, folder: Path = HTTP_CACHE_FOLDER, max_size: int = HTTP_CACHE_MAX_SIZE,
+                 offline: bool = HTTP_OFFLINE_MODE):
+        self.folder = folder
+        self.max_size = max_size
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+        self.total_size = None
+
+
+    def get(self, url: str) -> Optional[str]:
+        """ Get a page from the cache
+
+        Parameters
+        ----------
+        url : str
+            The url of the page
+
+        Returns
+        -------
+        Optional[str]
+            The content of the page, None if it isn't cached or if it is too old
+
+        """
+
+        page_path = self.get_page_path(url)
+        try:
+            with open(page_path, "rb") as page_file:
+                entry = pickle.load(page_file)
+
+            if entry["url"] == url and (self.offline or time.time() - entry["time"] < self.get_ttl(url)):
+                # The modification time is used to decide which pages are least recently used
+                os.utime(page_path)
+                self.hits += 1
+                return entry["text"]
+        except (OSError, EOFError, pickle.UnpicklingError, KeyError):
+            pass
+
+        self.misses += 1
+        return None
+
+
+    def put(self, url: str, text: str) -> None:
+        """ Store a page in the cache
+
+        Parameters
+        ----------
+        url : str
+            The url of the page
+        text : str
+            The content of the page
+
+        """
+
+        try:
+            Path.mkdir(self.folder, parents=True, exist_ok=True)
+            page_path = self.get_page_path(url)
+            temp_path = page_path.with_suffix(".{}.tmp".format(os.getpid()))
+            with open(temp_path, "wb") as page_file:
+                pickle.dump({"url": url, "time": time.time(), "text": text}, page_file)
+
+            # A page that is cached again replaces the old copy, only the difference in size is added to the total
+            try:
+                old_size = page_path.stat().st_size
+            except FileNotFoundError:
+                old_size = 0
+
+            # Replace the file in one go so that other processes never read a partially written page
+            os.replace(temp_path, page_path)
+
+            if self.total_size is None:
+                self.total_size = sum(path.stat().st_size for path in self.folder.glob("*.pkl"))
+            else:
+                self.total_size += page_path.stat().st_size - old_size
+
+            if self.total_size > self.max_size:
+                self.evict()
+        except OSError as e:
+            print("{} Failed to cache {}, got {}".format(DATA_COMMON_MESSAGE_HEADER, url, e))
+
+
+    def evict(self) -> None:
+        """ Remove the least recently used pages until the cache is below 90% of its maximum size """
+
+        pages = []
+        for path in self.folder.glob("*.pkl"):
+            try:
+                stat = path.stat()
+                pages.append((stat.st_mtime, stat.st_size, path))
+            except OSError:
+                pass
+
+        self.total_size = sum(size for _, size, _ in pages)
+        for _, size, path in sorted(pages):
+            if self.total_size <= 0.9 * self.max_size:
+                break
+
+            try:
+                path.unlink()
+                self.total_size -= size
+            except OSError:
+                pass
+
+
+    def get_ttl(self, url: str) -> float:
+        return HTTP_CACHE_TTL.get(urlsplit(url).netloc, HTTP_CACHE_DEFAULT_TTL)
+
+
+    def get_page_path(self, url: str) -> Path:
+        return Path.joinpath(self.folder, "{}.pkl".format(hashlib.sha1(url.encode("utf-8")).hexdigest()))
+
+
+    def get_statistics(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
@@ -0,0 +1,75 @@
+import threading
+import time
+
+from Definitions import *
+
+
+class RateLimiter():
+    """ Adaptive token bucket that limits the request rate to a single host
+
+    Description
+    -----------
+    Every request takes a token from the bucket, the bucket is refilled with 'rate' tokens per second and holds at
+    most 'burst' tokens. If no token is available 'acquire' sleeps until there is one.
+
+    The rate adapts to how the host responds: every successful request increases the rate by HTTP_RATE_INCREASE
+    requests per second, while a throttled request (429 or 5xx) multiplies it with HTTP_RATE_DECREASE. This finds the
+    highest rate that the host tolerates. If the host sends a 'Retry-After' time no tokens are handed out until it
+    has passed.
+
+    Attributes
+    ----------
+    rate : float
+        Current number of requests per second
+    burst : float
+        Maximum number of tokens in the bucket
+    tokens : float
+        Number of tokens currently in the bucket, negative while the host has asked to wait
+
+    """
+
+    def __init__(self, rate: float = HTTP_DEFAULT_RATE, burst: float = HTTP_BURST_SIZE,
+                 min_rate: float = HTTP_MIN_RATE, max_rate: float = HTTP_MAX_RATE):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.tokens = burst
+        self.last_refill = time.monotonic()
+        self.bucket_lock = threading.Lock()
+
+
+    def refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+
+    def acquire(self) -> None:
+        """ Wait until a request may be sent """
+
+        while True:
+            with self.bucket_lock:
+                self.refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait_time = (1 - self.tokens) / self.rate
+
+            time.sleep(wait_time)
+
+
+    def succeeded(self) -> None:
+        with self.bucket_lock:
+            self.rate = min(self.max_rate, self.rate + HTTP_RATE_INCREASE)
+
+
+    def throttled(self, retry_after: float = None) -> None:
+        """ Lower the rate after the host has throttled a request, optionally pausing for 'retry_after' seconds """
+
+        with self.bucket_lock:
+            self.refill()
+            self.rate = max(self.min_rate, self.rate * HTTP_RATE_DECREASE)
+            if retry_after:
+                self.tokens = min(self.tokens, -retry_after * self.rate)
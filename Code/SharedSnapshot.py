@@ -0,0 +1,228 @@
+import numpy as np
+import os
+import pandas as pd
+import pickle
+
+from multiprocessing import resource_tracker, shared_memory
+from typing import Tuple
+
+from Definitions import *
+
+
+# Column buffers start at multiples of this many bytes so that they can be viewed as numpy arrays
+BUFFER_ALIGNMENT = 8
+
+
+class SnapshotPublisher():
+    """ Publishes the stocklist of the writer process in shared memory
+
+    Description
+    -----------
+    Every published version of the stocklist is stored in a new shared memory block that is never changed after it
+    has been written. Numeric and boolean columns are stored as their raw buffers, nullable ones like the volumes
+    also get a buffer with their mask. String columns with few distinct values, like the sector, are dictionary
+    encoded as one code per row and every distinct string once, so decoding only has to create each distinct string
+    once. Categorical columns are stored the same way and decoded as categoricals again. Other object columns, e.g.
+    the symbols and names, are pickled.
+
+    The name of the block, its version and the layout of the columns are put in 'directory', a dict shared by a
+    multiprocessing.Manager, with a single update so that a reader never sees a half published snapshot. Use
+    'copy_snapshot' to get the stocklist in another process. The block of the previous version is unlinked when a new
+    version has been published, a reader that already has it attached can keep reading it.
+
+    The snapshot is not used in place, a reader always gets a copy of the complete stocklist, since the DataInterface
+    changes its stocklist when replies come in. Getting a copy saves reading and decoding the stocklist file and
+    taking the file lock, but its cost still grows with the size of the stocklist.
+
+    Attributes
+    ----------
+    directory : dict
+        Shared dict describing the latest published snapshot
+    shared_memory : multiprocessing.shared_memory.SharedMemory
+        The block holding the latest published snapshot
+    version : int
+        Version of the latest published snapshot, None if nothing has been published
+
+    """
+
+    def __init__(self, directory: dict):
+        self.directory = directory
+        self.shared_memory = None
+        self.version = None
+
+
+    def publish(self, stock_df: pd.DataFrame, version: int) -> None:
+        """ Publish a new version of the stocklist
+
+        Parameters
+        ----------
+        stock_df : pandas.DataFrame
+            The stocklist
+        version : int
+            Version of the data in the stocklist, increases with every update
+
+        """
+
+        if version == self.version:
+            return
+
+        columns = []
+        layout = []
+        size = 0
+        for col in stock_df.columns:
+            column_layout, buffers = encode_column(stock_df[col])
+            column_layout["name"] = col
+            for key, buffer in buffers.items():
+                column_layout[key] = (size, buffer.nbytes)
+                size += -(-buffer.nbytes // BUFFER_ALIGNMENT) * BUFFER_ALIGNMENT
+            layout.append(column_layout)
+            columns.append(buffers)
+
+        name = "{}_{}_{}".format(SHARED_SNAPSHOT_PREFIX, os.getpid(), version)
+        new_memory = shared_memory.SharedMemory(name=name, create=True, size=max(size, 1))
+        for column_layout, buffers in zip(layout, columns):
+            for key, buffer in buffers.items():
+                offset, nbytes = column_layout[key]
+                new_memory.buf[offset:offset + nbytes] = buffer.tobytes()
+
+        self.directory.update({"name": name, "version": version, "layout": layout})
+
+        if self.shared_memory is not None:
+            self.release(self.shared_memory)
+        self.shared_memory = new_memory
+        self.version = version
+
+
+    def release(self, old_memory: shared_memory.SharedMemory) -> None:
+        old_memory.close()
+        try:
+            old_memory.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def encode_column(series: pd.Series) -> Tuple[dict, dict]:
+    """ Split a column into the buffers that are stored in shared memory
+
+    Parameters
+    ----------
+    series : pandas.Series
+        The column to encode
+
+    Returns
+    -------
+    Tuple[dict, dict]
+        The layout of the column, without the offsets, and a dict with the buffers of the column as numpy arrays
+
+    """
+
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        if pd.api.types.infer_dtype(series.cat.categories, skipna=True) in ["string", "empty"]:
+            return {"kind": "categorical"}, encode_strings(series.cat.codes.values, series.cat.categories)
+    elif isinstance(series.dtype, pd.api.extensions.ExtensionDtype) and series.dtype.kind in "biuf":
+        numpy_dtype = series.dtype.numpy_dtype
+        return ({"kind": "nullable", "dtype": series.dtype.name, "numpy_dtype": numpy_dtype.str},
+                {"values": series.to_numpy(dtype=numpy_dtype, na_value=0), "mask": series.isna().values})
+    elif series.dtype.kind in "biuf":
+        return {"kind": "numeric", "dtype": series.dtype.str}, {"values": series.values}
+    elif pd.api.types.infer_dtype(series, skipna=True) in ["string", "empty"]:
+        codes, categories = pd.factorize(series)
+        # Unpickling creates the strings faster than slicing them out one by one
+        if len(categories) <= len(series.index) * SHARED_SNAPSHOT_MAX_DISTINCT_RATIO:
+            return {"kind": "strings"}, encode_strings(codes, categories)
+
+    return {"kind": "pickled"}, {"values": np.frombuffer(pickle.dumps(series.values), dtype=np.uint8)}
+
+
+def encode_strings(codes: np.ndarray, categories: pd.Index) -> dict:
+    """ Get the buffers of a dictionary encoded string column, the code -1 means that the value is missing """
+
+    # The offsets count characters, not bytes, so the strings can be sliced out of the decoded text
+    offsets = np.zeros(len(categories) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(category) for category in categories])
+    return {"codes": codes.astype(np.int32),
+            "offsets": offsets,
+            "characters": np.frombuffer("".join(categories).encode("utf-8"), dtype=np.uint8)}
+
+
+def decode_column(column_layout: dict, buffer: memoryview) -> np.ndarray:
+    """ Copy a column out of a shared memory block, see 'encode_column' """
+
+    def view(key: str, dtype) -> np.ndarray:
+        offset, nbytes = column_layout[key]
+        return np.ndarray(nbytes // np.dtype(dtype).itemsize, dtype=dtype, buffer=buffer, offset=offset)
+
+    if column_layout["kind"] == "numeric":
+        return view("values", column_layout["dtype"]).copy()
+
+    if column_layout["kind"] == "nullable":
+        array_type = pd.api.types.pandas_dtype(column_layout["dtype"]).construct_array_type()
+        return array_type(view("values", column_layout["numpy_dtype"]).copy(), view("mask", np.bool_).copy())
+
+    if column_layout["kind"] in ["strings", "categorical"]:
+        offsets = view("offsets", np.int64).tolist()
+        text = view("characters", np.uint8).tobytes().decode("utf-8")
+        # The last entry is used for the code -1, which means that the value is missing
+        categories = np.empty(len(offsets), dtype=object)
+        categories[:-1] = [text[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+        categories[-1] = np.nan
+        if column_layout["kind"] == "categorical":
+            return pd.Categorical.from_codes(view("codes", np.int32).copy(), categories[:-1])
+
+        return categories[view("codes", np.int32)]
+
+    return pickle.loads(view("values", np.uint8).tobytes())
+
+
+def copy_snapshot(directory: dict) -> Tuple[pd.DataFrame, int]:
+    """ Copy the latest stocklist published by a SnapshotPublisher
+
+    Description
+    -----------
+    Every column is copied out of the shared memory block, so the returned stocklist can be changed freely and stays
+    valid after a newer version has been published. The time this takes grows with the size of the stocklist. If
+    the block is unlinked before it could be attached the directory is read again.
+
+    Parameters
+    ----------
+    directory : dict
+        The dict that the SnapshotPublisher publishes to
+
+    Returns
+    -------
+    Tuple[pandas.DataFrame, int]
+        The stocklist and its version, (None, None) if nothing has been published
+
+    """
+
+    for _ in range(SHARED_SNAPSHOT_READ_ATTEMPTS):
+        snapshot = directory.copy()
+        if not snapshot:
+            break
+
+        try:
+            snapshot_memory = attach_snapshot(snapshot)
+        except FileNotFoundError:
+            continue
+
+        try:
+            columns = {column_layout["name"]: decode_column(column_layout, snapshot_memory.buf)
+                       for column_layout in snapshot["layout"]}
+        finally:
+            snapshot_memory.close()
+
+        return pd.DataFrame(columns), snapshot["version"]
+
+    return None, None
+
+
+def attach_snapshot(snapshot: dict) -> shared_memory.SharedMemory:
+    """ Attach the shared memory block of a published snapshot, raises FileNotFoundError if it has been unlinked """
+
+    snapshot_memory = shared_memory.SharedMemory(name=snapshot["name"])
+    # On POSIX attaching registers the block with the resource tracker of this process, which would unlink it when
+    # this process exits even though it is owned by the writer. Windows doesn't track shared memory.
+    if os.name == "posix" and not snapshot["name"].endswith("_{}_{}".format(os.getpid(), snapshot["version"])):
+        resource_tracker.unregister("/{}".format(snapshot_memory.name), "shared_memory")
+
+    return snapshot_memory
@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+
+
+class SortCache():
+    """ Sorted versions of the stocklists viewed in the GUI
+
+    Description
+    -----------
+    The viewed stocklists hold the stocks of the working stocklist, or a subset of them like the stocks that pass the
+    active filters. Every sorted version of the viewed stocklist is cached per column and direction, so clicking a
+    column heading that has been used before, e.g. when switching the direction back and forth, is a lookup. Sorting
+    one of the returned stocklists counts as sorting the viewed stocklist it came from.
+
+    Numeric, boolean and categorical columns are sorted with sort_values, which is already fast for them. Text columns
+    are compared as Python objects, so for them the working stocklist is sorted once per column and direction and the
+    permutation is cached. A viewed stocklist is then sorted by going through the permutation and keeping the stocks
+    that are in it, which takes linear time and never compares any values. The positions of the viewed stocks in the
+    working stocklist are looked up once per viewed stocklist.
+
+    Text columns are sorted stably and missing values are put last in both directions. The caches belong to one
+    stocklist and one viewed stocklist and are cleared when another one is sorted. A stocklist is never changed once it
+    is viewed, so a new version of the data always comes as a new stocklist.
+
+    Attributes
+    ----------
+    permutations : dict
+        Maps a column and direction to the positions of the stocks of the stocklist in sorted order
+    stocklist : pandas.DataFrame
+        The stocklist that the permutations belong to
+    view : pandas.DataFrame
+        The viewed stocklist, as it was before it was sorted
+    sorted_views : dict
+        Maps a column and direction to the sorted version of 'view'
+    view_rows : numpy.ndarray
+        The row in 'view' of every stock in 'stocklist', -1 for the stocks that aren't in it
+
+    """
+
+    def __init__(self):
+        self.permutations = {}
+        self.stocklist = None
+        self.view = None
+        self.sorted_views = {}
+        self.view_rows = None
+
+
+    def sort(self, stock_df: pd.DataFrame, stocklist: pd.DataFrame, column: str, ascending: bool) -> pd.DataFrame:
+        """ Sort a subset of the stocklist
+
+        Parameters
+        ----------
+        stock_df : pandas.DataFrame
+            The stocks to sort, all of them must be in 'stocklist'
+        stocklist : pandas.DataFrame
+            The stocklist that 'stock_df' was taken from, indexed on symbol
+        column : str
+            Column name to sort on
+        ascending : bool
+            The direction to sort in
+
+        Returns
+        -------
+        pandas.DataFrame
+            The sorted stocks
+
+        """
+
+        if stocklist is not self.stocklist:
+            self.permutations = {}
+            self.stocklist = stocklist
+            self.view = None
+
+        if stock_df is not self.view and not any(stock_df is sorted_view for sorted_view in self.sorted_views.values()):
+            self.view = stock_df
+            self.sorted_views = {}
+            self.view_rows = None
+
+        key = (column, ascending)
+        if key not in self.sorted_views:
+            self.sorted_views[key] = self.sort_view(column, ascending)
+
+        return self.sorted_views[key]
+
+
+    def sort_view(self, column: str, ascending: bool) -> pd.DataFrame:
+        """ Sort the viewed stocklist, with the cached permutation of the stocklist if the column holds text """
+
+        if column not in self.stocklist.columns or self.stocklist[column].dtype != object:
+            return self.view.sort_values(by=[column], ascending=ascending)
+
+        if self.view_rows is None:
+            positions = self.stocklist.index.get_indexer(self.view.index)
+            if (positions < 0).any():
+                return self.view.sort_values(by=[column], ascending=ascending, kind="stable", na_position="last")
+
+            self.view_rows = np.full(len(self.stocklist.index), -1, dtype=np.int64)
+            self.view_rows[positions] = np.arange(len(positions))
+
+        rows = self.view_rows[self.get_permutation(column, ascending)]
+
+        return self.view.iloc[rows[rows >= 0]]
+
+
+    def get_permutation(self, column: str, ascending: bool) -> np.ndarray:
+        """ Get the positions of the stocks of the stocklist sorted on a column, from the cache if possible """
+
+        key = (column, ascending)
+        if key not in self.permutations:
+            values = self.stocklist[column].reset_index(drop=True)
+            self.permutations[key] = values.sort_values(ascending=ascending, kind="stable",
+                                                        na_position="last").index.values
+
+        return self.permutations[key]
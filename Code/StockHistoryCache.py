@@ -0,0 +1,107 @@
+import os
+import pandas as pd
+import pickle
+
+from pathlib import Path
+from typing import Iterable, List, Set, Tuple
+
+from Definitions import *
+
+
+class StockHistoryCache():
+    """ Per stock cache of the data collected over time, stored in TIME_SORTED_DATA
+
+    Description
+    -----------
+    Every cached stock has a file with the history of the stock, one row per day, and the dates that the history
+    covers. A day is covered once it has been looked up, also when the stock didn't exist that day, so that only the
+    days that have been added since can be looked up and appended, see 'get_missing_days'. The row of the current
+    day is never covered since it changes during the day.
+
+    Caches written before the covered dates were recorded only hold the history. Their last row can have been taken
+    from the data of the day they were written, before that day was complete, so every day except the last one is
+    treated as covered.
+
+    Attributes
+    ----------
+    folder : pathlib.Path
+        The folder where the caches are stored
+
+    """
+
+    def __init__(self, folder: Path = TIME_SORTED_DATA):
+        self.folder = folder
+
+
+    def get_path(self, symbol: str) -> Path:
+        return Path.joinpath(self.folder, "{}.pkl".format(symbol))
+
+
+    def get_symbols(self) -> List[str]:
+        """ Get the symbols of all cached stocks """
+
+        if not self.folder.is_dir():
+            return []
+
+        return [path.stem for path in self.folder.glob("*.pkl")]
+
+
+    def read(self, symbol: str) -> Tuple[pd.DataFrame, Set[str]]:
+        """ Read the cache of a stock
+
+        Parameters
+        ----------
+        symbol : str
+            Ticker symbol for the stock
+
+        Returns
+        -------
+        Tuple[pandas.DataFrame, Set[str]]
+            The history of the stock indexed on date and the dates that it covers, (None, empty set) if the stock
+            isn't cached
+
+        """
+
+        try:
+            cache = pd.read_pickle(self.get_path(symbol))
+        except (OSError, EOFError, pickle.UnpicklingError) as e:
+            if not isinstance(e, FileNotFoundError):
+                print("{} Failed to read the history of {}, got {}".format(DATA_COMMON_MESSAGE_HEADER, symbol, e))
+            return None, set()
+
+        if isinstance(cache, pd.DataFrame):
+            return cache, set(cache.index[:-1])
+
+        return cache["data"], set(cache["covered_dates"])
+
+
+    def write(self, symbol: str, stock_history: pd.DataFrame, covered_dates: Iterable[str]) -> None:
+        """ Write the cache of a stock, the old cache is replaced once the new one is complete """
+
+        try:
+            Path.mkdir(self.folder, parents=True, exist_ok=True)
+            path = self.get_path(symbol)
+            temp_path = path.with_suffix(".{}.tmp".format(os.getpid()))
+            pd.to_pickle({"data": stock_history, "covered_dates": sorted(covered_dates)}, temp_path)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print("{} Failed to write the history of {}, got {}".format(DATA_COMMON_MESSAGE_HEADER, symbol, e))
+
+
+def get_missing_days(covered_dates: Set[str], days: Iterable[str]) -> List[str]:
+    """ Get the days that aren't covered by a cache, in the order they are given """
+
+    return [day for day in days if day not in covered_dates]
+
+
+def append_days(stock_history: pd.DataFrame, new_rows: pd.DataFrame, days: Iterable[str]) -> pd.DataFrame:
+    """ Replace the rows of the given days in a history with the new rows, the stock may not have a row every day """
+
+    stock_history = stock_history.drop(list(days), errors="ignore")
+    new_rows = new_rows.reindex(columns=stock_history.columns)
+    if stock_history.empty:
+        stock_history = new_rows
+    elif not new_rows.empty:
+        stock_history = pd.concat([stock_history, new_rows])
+
+    return stock_history.sort_index()
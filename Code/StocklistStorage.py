@@ -0,0 +1,314 @@
+import json
+import os
+import pandas as pd
+
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import List
+
+from Definitions import *
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+
+class StocklistStorage(ABC):
+    """ Reads and writes the stocklist of a day folder
+
+    Description
+    -----------
+    Base class for the storage backends, the backend decides the format and the suffix of the stocklist files. Only
+    the columns are stored, the symbol index is recreated when a stocklist is read.
+
+    A stocklist file is never changed once it has been written. Every write creates a new version of the stocklist,
+    named STOCKLIST_PICKLE_FILE.<version><suffix>, together with a new delta log, see DeltaLog.py. The manifest of the
+    folder names the files of the current version and is replaced atomically once the new files are in place, so a
+    reader that reads the manifest always finds a complete stocklist and the delta log belonging to it, without
+    taking any lock. The files of the STOCKLIST_VERSIONS_TO_KEEP latest versions are kept, so that a reader that read
+    the manifest just before a write can still open its files, older versions are removed.
+
+    Folders without a manifest have a single stocklist file named STOCKLIST_PICKLE_FILE, in the format of the backend
+    or as a pickle, which is how stocklists used to be stored. They are read as version None.
+
+    Attributes
+    ----------
+    suffix : str
+        Suffix of the stocklist files written by the backend
+
+    """
+
+    suffix = ".pkl"
+
+
+    def get_path(self, folder: Path, suffix: str = None) -> Path:
+        """ Get the path of the unversioned stocklist that is used in folders without a manifest """
+
+        return Path.joinpath(folder, "{}{}".format(STOCKLIST_PICKLE_FILE, suffix if suffix else self.suffix))
+
+
+    def read_manifest(self, folder: Path) -> dict:
+        """ Get the files of the current version of the stocklist in a folder
+
+        Parameters
+        ----------
+        folder : pathlib.Path
+            The day folder
+
+        Returns
+        -------
+        dict
+            The 'version' of the stocklist and the names of its 'stocklist' and 'delta_log' files
+
+        """
+
+        try:
+            with open(Path.joinpath(folder, STOCKLIST_MANIFEST_FILE), "r") as manifest_file:
+                return json.load(manifest_file)
+        except (OSError, ValueError):
+            pass
+
+        stocklist_path = self.get_path(folder)
+        if not stocklist_path.exists():
+            stocklist_path = self.get_path(folder, PickleStorage.suffix)
+
+        return {"version": None,
+                "stocklist": stocklist_path.name,
+                "delta_log": "{}.jsonl".format(STOCKLIST_DELTA_LOG_FILE)}
+
+
+    def get_stocklist_path(self, folder: Path, manifest: dict = None) -> Path:
+        manifest = manifest if manifest else self.read_manifest(folder)
+        return Path.joinpath(folder, manifest["stocklist"])
+
+
+    def get_delta_log_path(self, folder: Path, manifest: dict = None) -> Path:
+        manifest = manifest if manifest else self.read_manifest(folder)
+        return Path.joinpath(folder, manifest["delta_log"])
+
+
+    def exists(self, folder: Path) -> bool:
+        """ Check if a folder contains a stocklist """
+
+        return self.get_stocklist_path(folder).exists()
+
+
+    def read(self, folder: Path, columns: List[str] = None, manifest: dict = None) -> pd.DataFrame:
+        """ Read the current version of the stocklist of a folder
+
+        Parameters
+        ----------
+        folder : pathlib.Path
+            The day folder to read from
+        columns : List[str]
+            Optional, only these columns are read. Columns that don't exist in the file are left out of the result.
+        manifest : dict
+            Optional, the manifest to read the stocklist of. The manifest of the folder is read if not given.
+
+        Returns
+        -------
+        pandas.DataFrame
+            The stocklist
+
+        """
+
+        path = self.get_stocklist_path(folder, manifest)
+        # The stocklist can have been written by another backend, the suffix tells which
+        storage = next((backend() for backend in STOCKLIST_STORAGE_BACKENDS.values() if backend.suffix == path.suffix),
+                       self)
+        return storage.read_file(path, columns)
+
+
+    def write(self, stock_df: pd.DataFrame, folder: Path) -> dict:
+        """ Write a new version of the stocklist of a folder, the index of the stocklist isn't stored
+
+        Parameters
+        ----------
+        stock_df : pandas.DataFrame
+            The stocklist
+        folder : pathlib.Path
+            The day folder to write to
+
+        Returns
+        -------
+        dict
+            The manifest of the new version
+
+        """
+
+        # Restoring a stored index costs more than reading the columns of a stocklist
+        stock_df = stock_df.reset_index(drop=True)
+        version = (self.read_manifest(folder)["version"] or 0) + 1
+        manifest = {"version": version,
+                    "stocklist": "{}.{}{}".format(STOCKLIST_PICKLE_FILE, version, self.suffix),
+                    "delta_log": "{}.{}.jsonl".format(STOCKLIST_DELTA_LOG_FILE, version)}
+
+        self.replace_file(Path.joinpath(folder, manifest["stocklist"]),
+                          lambda temp_path: self.write_file(stock_df, temp_path))
+        self.replace_file(Path.joinpath(folder, STOCKLIST_MANIFEST_FILE),
+                          lambda temp_path: temp_path.write_text(json.dumps(manifest)))
+        self.remove_old_versions(folder, version)
+
+        return manifest
+
+
+    def replace_file(self, path: Path, write_function) -> None:
+        """ Call 'write_function' with a temporary path and move the written file to 'path' """
+
+        temp_path = path.with_suffix(".{}.tmp".format(os.getpid()))
+        try:
+            write_function(temp_path)
+            os.replace(temp_path, path)
+        finally:
+            if temp_path.exists():
+                temp_path.unlink()
+
+
+    def remove_old_versions(self, folder: Path, version: int) -> None:
+        for prefix in [STOCKLIST_PICKLE_FILE, STOCKLIST_DELTA_LOG_FILE]:
+            for path in folder.glob("{}.*".format(prefix)):
+                file_version = path.name[len(prefix) + 1:].split(".")[0]
+                if file_version.isdigit() and int(file_version) <= version - STOCKLIST_VERSIONS_TO_KEEP:
+                    try:
+                        path.unlink()
+                    except OSError as e:
+                        print("{} Failed to remove {}, got {}".format(DATA_COMMON_MESSAGE_HEADER, path, e))
+
+
+    @abstractmethod
+    def read_file(self, path: Path, columns: List[str] = None) -> pd.DataFrame:
+        pass
+
+
+    @abstractmethod
+    def write_file(self, stock_df: pd.DataFrame, path: Path) -> None:
+        pass
+
+
+class PickleStorage(StocklistStorage):
+    """ Stores the stocklist as a pickled DataFrame, this is how the stocklists used to be stored
+
+    Every read deserializes the complete file, columns are only selected afterwards.
+    """
+
+    suffix = ".pkl"
+
+
+    def read_file(self, path: Path, columns: List[str] = None) -> pd.DataFrame:
+        stock_df = pd.read_pickle(path)
+        if columns is not None:
+            stock_df = stock_df[[col for col in columns if col in stock_df.columns]]
+
+        return stock_df
+
+
+    def write_file(self, stock_df: pd.DataFrame, path: Path) -> None:
+        stock_df.to_pickle(path)
+
+
+class ParquetStorage(StocklistStorage):
+    """ Stores the stocklist as a Parquet file
+
+    Description
+    -----------
+    Parquet is a compressed columnar format, so a reader that asks for a few columns only reads and decodes those
+    columns. Unlike a pickle it can be read by other tools and loading it can't execute code.
+
+    Parquet needs every column to have a single type. Older stocklists have object columns that mix strings and
+    numbers with stray booleans, these are cleaned up by 'prepare_columns' before writing.
+    """
+
+    suffix = ".parquet"
+
+
+    def read_file(self, path: Path, columns: List[str] = None) -> pd.DataFrame:
+        # Stocklists are small, so threads and the dataset layer of pandas.read_parquet only add overhead
+        parquet_file = pq.ParquetFile(path)
+        if columns is not None:
+            columns = [col for col in columns if col in parquet_file.schema_arrow.names]
+
+        return parquet_file.read(columns=columns, use_threads=False).to_pandas(use_threads=False)
+
+
+    def write_file(self, stock_df: pd.DataFrame, path: Path) -> None:
+        self.prepare_columns(stock_df).to_parquet(path, index=False)
+
+
+    def prepare_columns(self, stock_df: pd.DataFrame) -> pd.DataFrame:
+        """ Give every object column of a stocklist a single type
+
+        Description
+        -----------
+        Booleans in an object column are never real data, they are treated as missing values. A column that still
+        contains strings keeps only its strings, any other column is converted to numbers.
+
+        Parameters
+        ----------
+        stock_df : pandas.DataFrame
+            The stocklist to write
+
+        Returns
+        -------
+        pandas.DataFrame
+            A copy of the stocklist where the mixed columns have been converted, or the stocklist itself if there were
+            none
+
+        """
+
+        mixed_columns = [col for col in stock_df.columns if stock_df[col].dtype == object and
+                         pd.api.types.infer_dtype(stock_df[col], skipna=True) not in ["string", "empty"]]
+        if not mixed_columns:
+            return stock_df
+
+        stock_df = stock_df.copy()
+        for col in mixed_columns:
+            is_string = stock_df[col].map(lambda value: isinstance(value, str))
+            if is_string.any():
+                stock_df[col] = stock_df[col].where(is_string, None)
+            else:
+                is_bool = stock_df[col].map(lambda value: isinstance(value, bool))
+                stock_df[col] = pd.to_numeric(stock_df[col].mask(is_bool), errors="coerce")
+
+        return stock_df
+
+
+class FeatherStorage(ParquetStorage):
+    """ Stores the stocklist as a lz4 compressed Feather (Arrow IPC) file
+
+    Description
+    -----------
+    Columnar like Parquet, but the file layout is the same as Arrow's in memory layout, so there is less to decode
+    when a stocklist is read. The columns are prepared in the same way as for Parquet.
+    """
+
+    suffix = ".feather"
+
+
+    def read_file(self, path: Path, columns: List[str] = None) -> pd.DataFrame:
+        if columns is not None:
+            # Only the footer of the file is read to get the schema
+            stored_columns = pa.ipc.open_file(str(path)).schema.names
+            columns = [col for col in columns if col in stored_columns]
+
+        return feather.read_table(path, columns=columns, memory_map=True).to_pandas(use_threads=False)
+
+
+    def write_file(self, stock_df: pd.DataFrame, path: Path) -> None:
+        feather.write_feather(self.prepare_columns(stock_df), path, compression="lz4")
+
+
+STOCKLIST_STORAGE_BACKENDS = {"feather": FeatherStorage, "parquet": ParquetStorage, "pickle": PickleStorage}
+
+
+def get_stocklist_storage(backend: str = STOCKLIST_STORAGE_BACKEND) -> StocklistStorage:
+    """ Get the storage backend with the given name, the pickle backend is used if pyarrow isn't installed """
+
+    if backend != "pickle" and not PYARROW_AVAILABLE:
+        backend = "pickle"
+
+    return STOCKLIST_STORAGE_BACKENDS[backend]()
+
@@ -0,0 +1,125 @@
+import os
+import pickle
+import threading
+import time
+
+from pathlib import Path
+from typing import Optional
+
+from Definitions import *
+
+
+class SymbolNameStore():
+    """ Persistent mapping from ticker symbols to company names
+
+    Description
+    -----------
+    Company names never change, so once a name has been found for a symbol it is stored here and the webpages don't
+    have to be parsed again. Lookups that failed are stored as well, but only for SYMBOL_NAME_FAILED_EXPIRY seconds
+    so that they are retried eventually. The store is loaded from disk once and new entries are written back in
+    batches of SYMBOL_NAME_FLUSH_INTERVAL, or when 'flush' is called.
+
+    Attributes
+    ----------
+    path : pathlib.Path
+        The file where the names are stored
+    names : dict
+        Maps a symbol to the name of the company
+    failed_lookups : dict
+        Maps a symbol to the time when looking up its name failed
+    unsaved_entries : int
+        Number of entries that have been added since the store was written to disk
+
+    """
+
+    def __init__(self, path: Path = SYMBOL_NAME_FILE):
+        self.path = path
+        self.unsaved_entries = 0
+        self.store_lock = threading.Lock()
+        self.names, self.failed_lookups = self.read_store()
+
+
+    def read_store(self) -> tuple:
+        try:
+            with open(self.path, "rb") as store_file:
+                store = pickle.load(store_file)
+            return store["names"], store["failed_lookups"]
+        except (OSError, EOFError, pickle.UnpicklingError, KeyError):
+            return {}, {}
+
+
+    def get(self, symbol: str) -> Optional[str]:
+        """ Get the name of a stock
+
+        Parameters
+        ----------
+        symbol : str
+            Ticker symbol for the stock
+
+        Returns
+        -------
+        Optional[str]
+            The name of the stock, an empty string if the name recently couldn't be found and None if the symbol
+            has to be looked up
+
+        """
+
+        with self.store_lock:
+            if symbol in self.names:
+                return self.names[symbol]
+
+            if time.time() - self.failed_lookups.get(symbol, 0) < SYMBOL_NAME_FAILED_EXPIRY:
+                return ""
+
+        return None
+
+
+    def set(self, symbol: str, name: str) -> None:
+        """ Store the result of a name lookup, an empty name means that the lookup failed """
+
+        with self.store_lock:
+            if name:
+                self.names[symbol] = name
+                self.failed_lookups.pop(symbol, None)
+            else:
+                self.failed_lookups[symbol] = time.time()
+
+            self.unsaved_entries += 1
+            flush_store = self.unsaved_entries >= SYMBOL_NAME_FLUSH_INTERVAL
+
+        if flush_store:
+            self.flush()
+
+
+    def flush(self) -> None:
+        """ Write all new entries to disk
+
+        Description
+        -----------
+        The file is read again before writing so that entries added by other processes are kept. It is written to a
+        temporary file which then replaces the old one so that a partially written store is never read.
+
+        """
+
+        with self.store_lock:
+            if self.unsaved_entries == 0:
+                return
+
+            names, failed_lookups = self.read_store()
+            names.update(self.names)
+            failed_lookups.update(self.failed_lookups)
+            for symbol in names:
+                failed_lookups.pop(symbol, None)
+
+            try:
+                Path.mkdir(self.path.parent, parents=True, exist_ok=True)
+                temp_path = self.path.with_suffix(".{}.tmp".format(os.getpid()))
+                with open(temp_path, "wb") as store_file:
+                    pickle.dump({"names": names, "failed_lookups": failed_lookups}, store_file)
+                os.replace(temp_path, self.path)
+
+                self.names = names
+                self.failed_lookups = failed_lookups
+                self.unsaved_entries = 0
+            except OSError as e:
+                print("{} Failed to write symbol names, got {}".format(DATA_COMMON_MESSAGE_HEADER, e))
@@ -0,0 +1,103 @@
+from bs4 import BeautifulSoup, SoupStrainer
+from typing import List
+
+from Definitions import *
+
+try:
+    import lxml.html
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+
+TABLE_PARSER_BACKENDS = ["lxml", "strained", "bs4"]
+
+
+def parse_table(page: str, columns: List[int], cell_class: str = None, markers: dict = None,
+                backend: str = HTML_PARSER_BACKEND) -> List[list]:
+    """ Parse the cells of all table rows in a webpage into column lists
+
+    Description
+    -----------
+    Goes through every 'tr' element in the page and collects the text of the requested 'td' cells. Rows that don't
+    have all requested cells are skipped. The result contains one list per requested column, which means that it can
+    be given directly to a pandas.DataFrame.
+
+    The following backends can be used:
+    - lxml: Parses the page with lxml and only visits the rows and cells, this is the fastest backend
+    - strained: BeautifulSoup that only builds the 'tr' elements of the page
+    - bs4: BeautifulSoup that builds the complete page, this is how pages used to be parsed
+
+    If lxml isn't installed the strained backend is used instead.
+
+    Parameters
+    ----------
+    page : str
+        The content of the webpage
+    columns : List[int]
+        Index of the cells in a row to get the text from
+    cell_class : str
+        Optional, only cells with this class are counted
+    markers : dict
+        Optional, maps a cell index to a class name. For each marker a column is added after the text columns that
+        is True if the cell contains an element with that class.
+    backend : str
+        Which parser backend to use
+
+    Returns
+    -------
+    List[list]
+        One list for each requested column followed by one list for each marker
+
+    """
+
+    markers = markers if markers else {}
+    if backend == "lxml" and not LXML_AVAILABLE:
+        backend = "strained"
+
+    if backend == "lxml":
+        rows = parse_rows_with_lxml(page, columns, cell_class, markers)
+    else:
+        rows = parse_rows_with_bs4(page, columns, cell_class, markers, strained=backend == "strained")
+
+    num_columns = len(columns) + len(markers)
+    return [list(column) for column in zip(*rows)] if rows else [[] for _ in range(num_columns)]
+
+
+def parse_rows_with_lxml(page: str, columns: List[int], cell_class: str, markers: dict) -> List[tuple]:
+    rows = []
+    if not page.strip():
+        return rows
+
+    last_cell = max(list(columns) + list(markers.keys()))
+    for row in lxml.html.fromstring(page).iter("tr"):
+        cells = [cell for cell in row.iterdescendants("td")
+                 if cell_class is None or cell_class in cell.get("class", "").split()]
+        if len(cells) <= last_cell:
+            continue
+
+        values = [cells[i].text_content() for i in columns]
+        for i, marker_class in markers.items():
+            values.append(any(marker_class in element.get("class", "").split() for element in cells[i].iter()))
+
+        rows.append(tuple(values))
+
+    return rows
+
+
+def parse_rows_with_bs4(page: str, columns: List[int], cell_class: str, markers: dict, strained: bool) -> List[tuple]:
+    rows = []
+    last_cell = max(list(columns) + list(markers.keys()))
+    soup = BeautifulSoup(page, "html.parser", parse_only=SoupStrainer("tr") if strained else None)
+    for row in soup.find_all("tr"):
+        cells = row.find_all("td", {"class": cell_class}) if cell_class else row.find_all("td")
+        if len(cells) <= last_cell:
+            continue
+
+        values = [cells[i].get_text() for i in columns]
+        for i, marker_class in markers.items():
+            values.append(cells[i].find(class_=marker_class) is not None)
+
+        rows.append(tuple(values))
+
+    return rows
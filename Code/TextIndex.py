@@ -0,0 +1,208 @@
+import numpy as np
+import pandas as pd
+
+from typing import List
+
+
+# Length of the substrings that are indexed
+NGRAM_LENGTH = 3
+# Characters with a special meaning in the regular expressions of the text filters
+REGEX_CHARACTERS = set(".^$*+?{}[]\\|()")
+
+
+class TextIndex():
+    """ Index of the texts of a column, used by the text filters
+
+    Description
+    -----------
+    Every distinct text of the column is stored once, lowercased, and gets an id. For every trigram, i.e. substring
+    of three characters, the index keeps the ids of the texts that contain it. A substring search only has to check
+    the texts that contain every trigram of the search string, so it doesn't have to look at every text. Searches
+    shorter than a trigram check every text.
+
+    Texts are only ever added, so the same index can be used for every version of the stocklist and only the texts
+    that are new have to be indexed. Use 'index_column' to get a ColumnTextIndex, which maps the rows of a column to
+    the ids of their texts and is what the filter functions use.
+
+    Attributes
+    ----------
+    ids : dict
+        Maps a lowercased text to its id
+    texts : List[str]
+        The lowercased texts, the position is the id
+    postings : dict
+        Maps a trigram to the ids of the texts that contain it
+    values : list
+        The values of the columns that have been indexed, as they are in the column
+    value_ids : List[int]
+        The id of the text of every value, -1 for values that aren't texts
+
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self.texts = []
+        self.postings = {}
+        self.posting_arrays = {}
+        self.values = []
+        self.value_ids = []
+        self.value_index = None
+        self.value_id_array = None
+
+
+    def index_column(self, series: pd.Series) -> "ColumnTextIndex":
+        """ Add the texts of a column to the index and get the ids of the texts of its rows
+
+        Parameters
+        ----------
+        series : pandas.Series
+            The column
+
+        Returns
+        -------
+        ColumnTextIndex
+            The index of the column, values that aren't texts get the id -1
+
+        """
+
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            # Missing values have the code -1, which picks the last id
+            distinct_ids = np.append(self.get_ids(series.cat.categories), -1)
+            return ColumnTextIndex(self, distinct_ids[series.cat.codes.values])
+
+        return ColumnTextIndex(self, self.get_ids(series))
+
+
+    def get_ids(self, values) -> np.ndarray:
+        """ Get the ids of the texts of some values, -1 for missing values and values that aren't texts
+
+        The values that have been seen before are looked up in a hash table all at once, only new values have to be
+        lowercased and indexed one by one.
+        """
+
+        positions = self.get_value_index().get_indexer(values)
+        new_values = pd.unique(np.asarray(values, dtype=object)[positions < 0])
+        new_values = new_values[pd.notna(new_values)]
+        if len(new_values) > 0:
+            for value in new_values:
+                self.values.append(value)
+                self.value_ids.append(self.add(value))
+
+            self.value_index = None
+            self.posting_arrays = {}
+            positions = self.get_value_index().get_indexer(values)
+
+        # Missing values aren't in the index and get the position -1, which picks the last id
+        return self.value_id_array[positions]
+
+
+    def get_value_index(self) -> pd.Index:
+        if self.value_index is None:
+            self.value_index = pd.Index(self.values, dtype=object)
+            self.value_id_array = np.array(self.value_ids + [-1], dtype=np.int64)
+
+        return self.value_index
+
+
+    def add(self, value) -> int:
+        """ Get the id of a text, the text is indexed if it is new. The cached posting arrays are reset by get_ids """
+
+        if not isinstance(value, str):
+            return -1
+
+        text = value.lower()
+        text_id = self.ids.get(text)
+        if text_id is None:
+            text_id = len(self.texts)
+            self.ids[text] = text_id
+            self.texts.append(text)
+            for ngram in set(get_ngrams(text)):
+                self.postings.setdefault(ngram, []).append(text_id)
+
+        return text_id
+
+
+    def find_containing(self, search_string: str) -> np.ndarray:
+        """ Get a boolean array over the ids telling which texts contain a string, ignoring case """
+
+        search_string = search_string.lower()
+        matches = np.zeros(len(self.texts) + 1, dtype=bool)
+        ngrams = set(get_ngrams(search_string))
+        if not ngrams:
+            matches[:-1] = [search_string in text for text in self.texts]
+            return matches
+
+        # Starting with the rarest trigram keeps the intersections small
+        candidates = None
+        for ngram in sorted(ngrams, key=lambda ngram: len(self.postings.get(ngram, []))):
+            posting = self.get_posting_array(ngram)
+            candidates = posting if candidates is None else np.intersect1d(candidates, posting, assume_unique=True)
+            if candidates.size == 0:
+                return matches
+
+        # Having all trigrams doesn't mean that they are next to each other
+        matches[[text_id for text_id in candidates if search_string in self.texts[text_id]]] = True
+        return matches
+
+
+    def find_equal(self, search_string: str) -> np.ndarray:
+        """ Get a boolean array over the ids telling which texts equal a string, ignoring case """
+
+        matches = np.zeros(len(self.texts) + 1, dtype=bool)
+        text_id = self.ids.get(search_string.lower())
+        if text_id is not None:
+            matches[text_id] = True
+
+        return matches
+
+
+    def get_posting_array(self, ngram: str) -> np.ndarray:
+        if ngram not in self.posting_arrays:
+            self.posting_arrays[ngram] = np.array(self.postings.get(ngram, []), dtype=np.int64)
+
+        return self.posting_arrays[ngram]
+
+
+class ColumnTextIndex():
+    """ The ids in a TextIndex of the texts in the rows of a column
+
+    Description
+    -----------
+    Passed to the text filter functions in DataCommon, which use it instead of searching the column. The masks have
+    the same values as the filter functions give, except that a row without a text never matches, also for
+    "does not contain".
+
+    Attributes
+    ----------
+    text_index : TextIndex
+        The index of the texts
+    row_ids : numpy.ndarray
+        The id of the text of every row, -1 for rows without a text
+
+    """
+
+    def __init__(self, text_index: TextIndex, row_ids: np.ndarray):
+        self.text_index = text_index
+        self.row_ids = row_ids
+
+
+    def can_search(self, search_string: str) -> bool:
+        """ Searches are done for plain strings, search strings with regular expression characters aren't indexed """
+
+        return isinstance(search_string, str) and not any(char in REGEX_CHARACTERS for char in search_string)
+
+
+    def contains(self, search_string: str) -> np.ndarray:
+        return self.text_index.find_containing(search_string)[self.row_ids]
+
+
+    def does_not_contain(self, search_string: str) -> np.ndarray:
+        return ~self.text_index.find_containing(search_string)[self.row_ids] & (self.row_ids >= 0)
+
+
+    def equals(self, search_string: str) -> np.ndarray:
+        return self.text_index.find_equal(search_string)[self.row_ids]
+
+
+def get_ngrams(text: str) -> List[str]:
+    return [text[i:i + NGRAM_LENGTH] for i in range(len(text) - NGRAM_LENGTH + 1)]
@@ -0,0 +1,255 @@
+import random
+import requests
+import threading
+import time
+
+from requests.adapters import HTTPAdapter
+from typing import Tuple
+from urllib.parse import urlsplit
+
+from Definitions import *
+from PageCache import PageCache
+from RateLimiter import RateLimiter
+
+
+class WebSession():
+    """ Shared HTTP session used by every function that fetches a webpage
+
+    Description
+    -----------
+    Wraps a requests.Session so that connections are kept alive and reused between requests instead of doing a new
+    TCP and TLS handshake for every page. Every host in HTTP_POOL_SIZES gets its own connection pool with the
+    configured size, all other hosts share a default adapter with HTTP_DEFAULT_POOL_SIZE connections per host. At most
+    HTTP_MAX_REQUESTS_PER_HOST requests are sent to the same host at once, other threads wait for their turn.
+
+    Every host also gets an adaptive RateLimiter. Requests that are throttled (429 or 5xx), time out or fail to
+    connect or are cut off while the body is read are retried up to HTTP_MAX_RETRIES times with an exponential backoff
+    with jitter. An attempt is never allowed to take more than HTTP_CONNECT_TIMEOUT seconds to connect,
+    HTTP_READ_TIMEOUT seconds between two reads or HTTP_REQUEST_DEADLINE seconds in total, counted from when the
+    request is sent, so a hung connection can't stall the gatherer.
+
+    Pages fetched with 'get_page' are stored in a PageCache, so that a page is only fetched again once the cached
+    copy is too old. In offline mode pages that aren't cached are returned as empty strings.
+
+    A session is not shared between processes, use 'get_web_session' to get the instance belonging to the current
+    process.
+
+    Attributes
+    ----------
+    session : requests.Session
+        The session that holds the connection pools
+    timeout : Tuple[float, float]
+        Default connect and read timeouts in seconds for all requests
+    page_cache : PageCache
+        Cache for the content of fetched webpages
+    host_limits : dict
+        Maps a host to the semaphore that limits the number of simultaneous requests to it
+    rate_limiters : dict
+        Maps a host to the RateLimiter that limits the request rate to it
+    statistics : dict
+        Number of requests that have been sent, throttled, retried or timed out
+
+    """
+
+    def __init__(self, pool_sizes: dict = HTTP_POOL_SIZES, default_pool_size: int = HTTP_DEFAULT_POOL_SIZE,
+                 timeout: tuple = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT), page_cache: PageCache = None):
+        self.timeout = timeout
+        self.page_cache = page_cache if page_cache else PageCache()
+        self.session = requests.Session()
+        self.host_limits = {}
+        self.rate_limiters = {}
+        self.host_limits_lock = threading.Lock()
+        self.statistics = {"requests": 0, "throttled": 0, "retried": 0, "timed_out": 0}
+        self.statistics_lock = threading.Lock()
+
+        default_adapter = HTTPAdapter(pool_connections=len(pool_sizes) + 1, pool_maxsize=default_pool_size)
+        self.session.mount("http://", default_adapter)
+        self.session.mount("https://", default_adapter)
+
+        for host, pool_size in pool_sizes.items():
+            host_adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            self.session.mount("http://{}".format(host), host_adapter)
+            self.session.mount("https://{}".format(host), host_adapter)
+
+
+    def get(self, url: str, timeout: tuple = None) -> Tuple[requests.Response, bytes]:
+        """ Perform a GET request using the pooled connections
+
+        Description
+        -----------
+        Waits for the rate limiter of the host before every attempt. Throttled, timed out and failed requests are
+        retried with backoff, if the last attempt fails as well its response is returned, or its exception raised.
+        The body is streamed and returned separately, the content of the response itself has already been consumed.
+
+        Parameters
+        ----------
+        url : str
+            The webpage to get
+        timeout : Tuple[float, float]
+            Optional connect and read timeouts in seconds, the default timeouts of the session are used if not set
+
+        Returns
+        -------
+        Tuple[requests.Response, bytes]
+            The response from the server and its body
+
+        """
+
+        host = urlsplit(url).netloc
+        host_limit, rate_limiter = self.get_host_limits(host)
+        for attempt in range(HTTP_MAX_RETRIES + 1):
+            if attempt > 0:
+                self.count("retried")
+                # Full jitter so that threads that failed at the same time don't retry at the same time
+                time.sleep(random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * 2 ** attempt)))
+
+            rate_limiter.acquire()
+            last_attempt = attempt == HTTP_MAX_RETRIES
+            try:
+                with host_limit:
+                    self.count("requests")
+                    # The deadline also covers waiting for the headers, which no read may take longer than
+                    deadline = time.monotonic() + HTTP_REQUEST_DEADLINE
+                    connect_timeout, read_timeout = timeout if timeout else self.timeout
+                    read_timeout = min(read_timeout, HTTP_REQUEST_DEADLINE)
+                    response = self.session.get(url, timeout=(connect_timeout, read_timeout), stream=True)
+                    content = self.read_content(response, deadline)
+            except requests.exceptions.Timeout:
+                self.count("timed_out")
+                if last_attempt:
+                    raise
+                continue
+            except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError):
+                if last_attempt:
+                    raise
+                continue
+
+            if response.status_code == 429 or response.status_code >= 500:
+                self.count("throttled")
+                rate_limiter.throttled(self.get_retry_after(response))
+                if not last_attempt:
+                    continue
+            else:
+                rate_limiter.succeeded()
+
+            return response, content
+
+
+    def read_content(self, response: requests.Response, deadline: float) -> bytes:
+        """ Read the body of a streamed response, raises requests.exceptions.Timeout if the deadline passes
+
+        Description
+        -----------
+        The body is read HTTP_READ_CHUNK_SIZE bytes at a time. A larger chunk is only returned once it is full, which
+        can take one read timeout for every packet of a slow server, so a small chunk keeps the time between two checks
+        of the deadline close to a single read timeout.
+
+        """
+
+        chunks = []
+        content = response.iter_content(chunk_size=HTTP_READ_CHUNK_SIZE)
+        # Checked before every chunk, so a deadline that passed while waiting for the headers is noticed as well
+        while time.monotonic() <= deadline:
+            chunk = next(content, None)
+            if chunk is None:
+                return b"".join(chunks)
+
+            chunks.append(chunk)
+
+        response.close()
+        raise requests.exceptions.Timeout("Reading {} took too long".format(response.url))
+
+
+    def get_retry_after(self, response: requests.Response) -> float:
+        try:
+            return min(HTTP_BACKOFF_MAX, float(response.headers.get("Retry-After", 0)))
+        except ValueError:
+            return 0
+
+
+    def get_host_limits(self, host: str) -> tuple:
+        """ Get the semaphore and the RateLimiter of a host, they are created the first time the host is used """
+
+        with self.host_limits_lock:
+            if host not in self.host_limits:
+                self.host_limits[host] = threading.BoundedSemaphore(HTTP_MAX_REQUESTS_PER_HOST)
+                self.rate_limiters[host] = RateLimiter()
+
+            return self.host_limits[host], self.rate_limiters[host]
+
+
+    def count(self, statistic: str) -> None:
+        with self.statistics_lock:
+            self.statistics[statistic] += 1
+
+
+    def get_statistics(self) -> dict:
+        """ Get the request counters together with the hit and miss counters of the page cache """
+
+        with self.statistics_lock:
+            statistics = self.statistics.copy()
+
+        statistics.update(self.page_cache.get_statistics())
+        return statistics
+
+
+    def get_page(self, url: str) -> str:
+        """ Get the content of a webpage as text
+
+        Description
+        -----------
+        Returns the cached page if there is a fresh copy, otherwise the page is fetched and cached if the request was
+        successful. In offline mode an empty string is returned for pages that aren't cached.
+
+        Parameters
+        ----------
+        url : str
+            The webpage to get
+
+        Returns
+        -------
+        str
+            The content of the webpage
+
+        """
+
+        page = self.page_cache.get(url)
+        if page is not None:
+            return page
+
+        if self.page_cache.offline:
+            print("{} Offline and {} isn't cached.".format(DATA_COMMON_MESSAGE_HEADER, url))
+            return ""
+
+        response, content = self.get(url)
+        page = self.decode_content(response, content)
+        if response.ok:
+            self.page_cache.put(url, page)
+
+        return page
+
+
+    def decode_content(self, response: requests.Response, content: bytes) -> str:
+        """ Decode a body read with 'get' the same way as requests.Response.text """
+
+        # Without a charset in the headers the encoding is guessed from the content
+        encoding = response.encoding or requests.compat.chardet.detect(content)["encoding"]
+        try:
+            return str(content, encoding or "utf-8", errors="replace")
+        except LookupError:
+            return str(content, "utf-8", errors="replace")
+
+
+_web_session = None
+_web_session_lock = threading.Lock()
+
+
+def get_web_session() -> WebSession:
+    """ Get the WebSession of the current process, it is created the first time this function is called """
+
+    global _web_session
+    with _web_session_lock:
+        if _web_session is None:
+            _web_session = WebSession()
+
+    return _web_session
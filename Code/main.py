@@ -5,26 +5,35 @@ from tkinter import *
 from multiprocessing.managers import BaseManager
 
 from DataInterface import DataInterface
-from Definitions import DATA_GATHERER_MESSAGE_HEADER, DATA_INTERFACE_MESSAGE_HEADER, GUI_MESSAGE_HEADER
+from Definitions import DATA_GATHERER_MESSAGE_HEADER, DATA_INTERFACE_MESSAGE_HEADER, DATA_WRITER_MESSAGE_HEADER, \
+                        GUI_MESSAGE_HEADER, NUMBER_OF_GATHERER_WORKERS
 from GUI import GUI
 from DataGatherer import DataGatherer
+from EnrichmentEngine import EnrichmentEngine
 
 
-def run_data_interface(event: mp.Event, lock: mp.Lock, queue: mp.Queue):
-    app = GUI(Tk(), event, lock, queue)
+def run_data_interface(event: mp.Event, lock: mp.Lock, queue: mp.Queue, snapshot_directory: dict):
+    app = GUI(Tk(), event, lock, queue, snapshot_directory)
     app.root.mainloop()
 
 
-def run_data_gatherer(event: mp.Event, lock: mp.Lock, queue: mp.Queue):
+def run_data_gatherer(event: mp.Event, lock: mp.Lock, queue: mp.Queue, snapshot_directory: dict):
     print("{} Data gatherer starting...".format(DATA_GATHERER_MESSAGE_HEADER))
-    data_gatherer = DataGatherer(lock, queue)
+    data_gatherer = DataGatherer(lock, queue, snapshot_directory)
     data_gatherer.gather_new_data()
     print("{} Data gathering finished!".format(DATA_GATHERER_MESSAGE_HEADER))
+    # Published before the event is set so that the GUI can start from the snapshot
+    data_gatherer.load_stocklist()
     event.set()
-    print("{} Event set! Will start gathering missing data...".format(DATA_GATHERER_MESSAGE_HEADER))
+    print("{} Event set! Will start writing data gathered by the workers...".format(DATA_GATHERER_MESSAGE_HEADER))
 
-    while True:
-        data_gatherer.check_message_queue()
+    data_gatherer.write_worker_results()
+
+
+def run_data_gatherer_worker(event: mp.Event, lock: mp.Lock, queue: mp.Queue, stocks_in_progress: dict):
+    event.wait()
+    print("{} Worker starting to gather missing data...".format(DATA_GATHERER_MESSAGE_HEADER))
+    EnrichmentEngine(DataGatherer(lock, queue), stocks_in_progress).run()
 
 
 if __name__ == "__main__":
@@ -42,15 +51,36 @@ if __name__ == "__main__":
     # The queue is intended to be used to signal the data interface when new data can be read
     dg_queue = mp.Queue()
     di_queue = mp.Queue()
-    queue = {DATA_GATHERER_MESSAGE_HEADER: dg_queue, DATA_INTERFACE_MESSAGE_HEADER: di_queue}
+    # The writer queue is used by the data gatherer workers to send their results to the single writer
+    dw_queue = mp.Queue()
+    queue = {DATA_GATHERER_MESSAGE_HEADER: dg_queue,
+             DATA_INTERFACE_MESSAGE_HEADER: di_queue,
+             DATA_WRITER_MESSAGE_HEADER: dw_queue}
+    # Keeps track of which stocks the data gatherer workers are currently updating
+    manager = mp.Manager()
+    stocks_in_progress = manager.dict()
+    # Describes the latest stocklist published in shared memory by the data gatherer
+    snapshot_directory = manager.dict()
 
-    data_if_proc = mp.Process(name="Data_Interface", target=run_data_interface, args=(event, lock, queue))
+    data_if_proc = mp.Process(name="Data_Interface", target=run_data_interface,
+                              args=(event, lock, queue, snapshot_directory))
     data_if_proc.start()
 
-    data_gath_proc = mp.Process(name="Data_Gatherer", target=run_data_gatherer, args=(event, lock, queue))
+    data_gath_proc = mp.Process(name="Data_Gatherer", target=run_data_gatherer,
+                                args=(event, lock, queue, snapshot_directory))
     data_gath_proc.start()
 
+    data_gath_workers = []
+    for i in range(NUMBER_OF_GATHERER_WORKERS):
+        data_gath_workers.append(mp.Process(name="Data_Gatherer_Worker_{}".format(i),
+                                            target=run_data_gatherer_worker,
+                                            args=(event, lock, queue, stocks_in_progress)))
+        data_gath_workers[i].start()
+
     data_if_proc.join()
 
     data_if_proc.kill()
     data_gath_proc.kill()
+    for worker in data_gath_workers:
+        worker.kill()
+    manager.shutdown()
@@ -0,0 +1,70 @@
+import numpy as np
+import os
+import pandas as pd
+import pytest
+import sys
+
+# The modules of the stock screener import each other by name from the Code folder
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Code"))
+
+from Benchmark import filter_stocklist_step_by_step
+from DataCommon import (cell_contains, cell_does_not_contain, cell_greater_than, cell_greater_than_or_equal,
+                        cell_is_nan, cell_is_not_nan, cell_less_than, cell_less_than_or_equal, cell_num_equals,
+                        cell_num_not_equals, cell_string_equals, cell_string_not_equals, index_on_symbol)
+
+
+TEXT_FILTERS = [(cell_contains, "o"), (cell_contains, "BANK"), (cell_does_not_contain, "up"),
+                (cell_does_not_contain, "bank"), (cell_string_equals, "Up"), (cell_string_not_equals, "down"),
+                (cell_is_nan, None), (cell_is_not_nan, None)]
+NUMERIC_FILTERS = [(cell_greater_than, 5), (cell_greater_than_or_equal, 5.0), (cell_less_than, 3),
+                   (cell_less_than_or_equal, 3), (cell_num_equals, 4), (cell_num_not_equals, 4),
+                   (cell_is_nan, None), (cell_is_not_nan, None)]
+
+
+@pytest.fixture
+def stocklist() -> pd.DataFrame:
+    """ 200 stocks indexed on symbol, with missing values in some of the text and numeric columns """
+
+    num_stocks = 200
+    random = np.random.default_rng(0)
+    volume = random.integers(0, 10, num_stocks).astype(float)
+    volume[::7] = np.nan
+    directions = random.choice(["up", "down", "Up"], num_stocks)
+    return index_on_symbol(pd.DataFrame({
+        "Symbol": ["S{}".format(i) for i in range(num_stocks)],
+        "Name": ["{} Bank {}".format(random.choice(["Oak", "Pine"]), i) for i in range(num_stocks)],
+        "Sector": random.choice(["Technology", "Finance", "Energy"], num_stocks),
+        "Direction": directions,
+        "Sentiment": pd.Series(directions).where(np.arange(num_stocks) % 5 != 0, np.nan).values,
+        "Volume": volume}))
+
+
+@pytest.fixture
+def get_filters():
+    """ Get every filter in TEXT_FILTERS or NUMERIC_FILTERS for every column of a stocklist """
+
+    def get_filters(stock_df: pd.DataFrame) -> list:
+        filters = []
+        for column in stock_df.columns:
+            is_numeric = pd.api.types.is_numeric_dtype(stock_df[column].dtype)
+            for func, val in NUMERIC_FILTERS if is_numeric else TEXT_FILTERS:
+                filters.append({"column": column, "func": func, "val": val, "label": column})
+
+        return filters
+
+    return get_filters
+
+
+@pytest.fixture
+def filter_step_by_step():
+    """ Filter like the DataInterface did before the FilterPipeline, the reference for the pipeline """
+
+    def filter_step_by_step(stock_df: pd.DataFrame, filters: list) -> pd.DataFrame:
+        try:
+            return filter_stocklist_step_by_step(stock_df, filters)
+        except TypeError:
+            # Filtering step by step failed on the missing values, in the pipeline they never pass the filter
+            columns = [filter["column"] for filter in filters]
+            return filter_stocklist_step_by_step(stock_df.dropna(subset=columns), filters)
+
+    return filter_step_by_step
@@ -0,0 +1,81 @@
+import multiprocessing as mp
+import numpy as np
+import pandas as pd
+import pytest
+
+from queue import Empty, Queue
+
+from DataGatherer import DataGatherer
+from DataInterface import DataInterface
+from Definitions import *
+from Messages import UpdateReply, UpdateResult
+from SharedSnapshot import SnapshotPublisher
+
+
+@pytest.fixture
+def data_interface(tmp_path, monkeypatch):
+    """ A DataInterface that reads a stocklist of ten stocks with missing data from a published snapshot """
+
+    monkeypatch.chdir(tmp_path)
+    stock_df = pd.DataFrame({"Symbol": ["B", "Z", "Q", "A", "C", "D", "E", "F", "G", "H"],
+                             "Name": np.nan,
+                             "Volume": np.arange(10, dtype=float),
+                             "Updated": False})
+    publisher = SnapshotPublisher({})
+    publisher.publish(stock_df, 1)
+    queue = {DATA_GATHERER_MESSAGE_HEADER: Queue(), DATA_INTERFACE_MESSAGE_HEADER: Queue()}
+    yield DataInterface(mp.Lock(), queue, publisher.directory)
+
+    publisher.release(publisher.shared_memory)
+
+
+def get_requests(data_interface: DataInterface) -> list:
+    requests = []
+    while True:
+        try:
+            requests.append(data_interface.queue[DATA_GATHERER_MESSAGE_HEADER].get_nowait())
+        except Empty:
+            return requests
+
+
+def get_requested_symbols(data_interface: DataInterface) -> list:
+    return [item.symbol for request in get_requests(data_interface) for item in request.items]
+
+
+def test_visible_stocks_are_only_requested_once(data_interface):
+    # The first stocks are shown in the GUI, and they are also due for an update
+    data_interface.fill_queue_with_stocks_to_update()
+    symbols = get_requested_symbols(data_interface)
+
+    assert len(symbols) == len(set(symbols))
+    assert sorted(symbols) == sorted(data_interface.stocklist["Symbol"])
+    assert symbols[:5] == list(data_interface.get_working_stocklist()["Symbol"])
+
+
+def test_stocks_of_a_failed_request_are_requested_again(data_interface):
+    data_interface.fill_queue_with_stocks_to_update()
+    failed_request = get_requests(data_interface)[0]
+    failed_symbols = [item.symbol for item in failed_request.items]
+
+    data_interface.queue[DATA_INTERFACE_MESSAGE_HEADER].put(UpdateReply(failed_request.request_id, pd.DataFrame(),
+                                                                        failed=True))
+    data_interface.update_stocklist()
+
+    assert failed_request.request_id not in data_interface.pending_requests
+    assert get_requested_symbols(data_interface) == failed_symbols
+
+
+def test_writer_replies_when_storing_fails(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    queue = {DATA_INTERFACE_MESSAGE_HEADER: Queue()}
+    data_gatherer = DataGatherer(mp.Lock(), queue)
+
+    def fail_to_update_data(stock_df):
+        raise OSError("Disk full")
+    monkeypatch.setattr(data_gatherer, "update_data", fail_to_update_data)
+
+    with pytest.raises(OSError):
+        data_gatherer.store_update_result(UpdateResult(3, pd.DataFrame({"Symbol": ["B"], "Updated": [True]})))
+
+    reply = queue[DATA_INTERFACE_MESSAGE_HEADER].get_nowait()
+    assert reply.request_id == 3 and reply.failed
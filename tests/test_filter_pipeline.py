@@ -0,0 +1,30 @@
+import pytest
+
+from DataCommon import cell_contains, cell_does_not_contain, cell_greater_than, cell_string_not_equals
+from FilterPipeline import FilterPipeline
+
+
+@pytest.mark.parametrize("categorical", [False, True])
+def test_pipeline_gives_the_same_rows_as_filtering_step_by_step(stocklist, get_filters, filter_step_by_step,
+                                                                categorical):
+    stock_df = stocklist
+    if categorical:
+        stock_df = stock_df.astype({"Sector": "category", "Direction": "category", "Sentiment": "category"})
+
+    for filter in get_filters(stock_df):
+        expected = filter_step_by_step(stock_df, [filter])
+        filtered_stock_df = FilterPipeline().apply(stock_df, [filter])
+        assert list(filtered_stock_df.index) == list(expected.index), filter
+
+
+def test_pipeline_gives_the_same_rows_for_combined_filters(stocklist, filter_step_by_step):
+    stock_df = stocklist
+    filters = [{"column": "Direction", "func": cell_does_not_contain, "val": "down", "label": ""},
+               {"column": "Volume", "func": cell_greater_than, "val": 2, "label": ""},
+               {"column": "Name", "func": cell_contains, "val": "oak", "label": ""},
+               {"column": "Sector", "func": cell_string_not_equals, "val": "energy", "label": ""}]
+
+    filter_pipeline = FilterPipeline()
+    for num_filters in range(1, len(filters) + 1):
+        expected = filter_step_by_step(stock_df, filters[:num_filters])
+        assert list(filter_pipeline.apply(stock_df, filters[:num_filters]).index) == list(expected.index)
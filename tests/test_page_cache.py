@@ -0,0 +1,28 @@
+from PageCache import PageCache
+
+
+def get_cache_size(page_cache: PageCache) -> int:
+    return sum(path.stat().st_size for path in page_cache.folder.glob("*.pkl"))
+
+
+def test_size_of_a_page_is_only_counted_once(tmp_path):
+    page_cache = PageCache(folder=tmp_path)
+    page_cache.put("http://example.com/a", "a" * 100)
+    page_cache.put("http://example.com/b", "b" * 100)
+
+    for length in [1000, 10, 500]:
+        page_cache.put("http://example.com/a", "a" * length)
+        assert page_cache.total_size == get_cache_size(page_cache)
+
+
+def test_rewriting_a_page_doesnt_evict_others(tmp_path):
+    page_cache = PageCache(folder=tmp_path)
+    page_cache.put("http://example.com/a", "a" * 500)
+    page_cache.put("http://example.com/b", "b" * 500)
+    # The cache is close to full, but not over its maximum size
+    page_cache.max_size = get_cache_size(page_cache) + 10
+
+    for _ in range(10):
+        page_cache.put("http://example.com/a", "a" * 500)
+
+    assert page_cache.get("http://example.com/b") == "b" * 500
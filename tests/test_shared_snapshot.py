@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from unittest import mock
+
+import SharedSnapshot
+from SharedSnapshot import SnapshotPublisher, copy_snapshot
+
+
+@pytest.fixture
+def published_snapshot():
+    stock_df = pd.DataFrame({"Symbol": ["A", "B", "C"],
+                             "Sector": pd.Categorical(["Energy", np.nan, "Tech"]),
+                             "Volume": pd.array([1, None, 3], dtype="Int64"),
+                             "Price": [1.5, np.nan, 2.0],
+                             "Updated": [True, False, False]})
+    publisher = SnapshotPublisher({})
+    publisher.publish(stock_df, 1)
+    # The snapshot is read as if it was published by another process
+    yield stock_df, dict(publisher.directory, version=2)
+
+    publisher.release(publisher.shared_memory)
+
+
+@pytest.mark.parametrize("os_name", ["posix", "nt"])
+def test_reading_a_snapshot_only_unregisters_the_block_on_posix(published_snapshot, monkeypatch, os_name):
+    stock_df, directory = published_snapshot
+    resource_tracker = mock.Mock()
+    monkeypatch.setattr(SharedSnapshot, "resource_tracker", resource_tracker)
+    monkeypatch.setattr(SharedSnapshot.os, "name", os_name)
+
+    snapshot_df, version = copy_snapshot(directory)
+
+    assert version == 2
+    pd.testing.assert_frame_equal(snapshot_df, stock_df)
+    if os_name == "posix":
+        resource_tracker.unregister.assert_called_once_with("/{}".format(directory["name"]), "shared_memory")
+    else:
+        resource_tracker.unregister.assert_not_called()
+
+
+def test_nothing_published():
+    assert copy_snapshot({}) == (None, None)
@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from SortCache import SortCache
+
+
+@pytest.fixture
+def stocklist():
+    return pd.DataFrame({"Name": ["b", np.nan, "a", "c", "a"],
+                         "Volume": pd.array([3, 1, None, 2, 5], dtype="Int64")},
+                        index=pd.Index(["B", "N", "A", "C", "D"], name="Ticker"))
+
+
+@pytest.mark.parametrize("column", ["Name", "Volume"])
+@pytest.mark.parametrize("ascending", [True, False])
+def test_sorted_like_sort_values(stocklist, column, ascending):
+    # Viewed stocklists keep the order of the stocklist, like the stocks that pass the filters
+    subset = stocklist.iloc[[0, 1, 2, 4]]
+
+    sorted_df = SortCache().sort(subset, stocklist, column, ascending)
+
+    pd.testing.assert_frame_equal(sorted_df, subset.sort_values(by=[column], ascending=ascending, kind="stable"))
+
+
+def test_sorting_a_sorted_view_again_is_a_lookup(stocklist):
+    sort_cache = SortCache()
+    by_name = sort_cache.sort(stocklist, stocklist, "Name", True)
+    by_volume = sort_cache.sort(by_name, stocklist, "Volume", False)
+
+    # Sorting the returned stocklists counts as sorting the stocklist they came from
+    assert sort_cache.sort(by_volume, stocklist, "Name", True) is by_name
+    assert sort_cache.sort(by_name, stocklist, "Volume", False) is by_volume
+
+    # Another viewed stocklist isn't given the sorted stocks of the previous one
+    subset = stocklist.iloc[:3]
+    assert list(sort_cache.sort(subset, stocklist, "Name", True).index) == ["A", "B", "N"]
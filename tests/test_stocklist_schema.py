@@ -0,0 +1,46 @@
+import pandas as pd
+import pytest
+
+from DataCommon import apply_stocklist_schema, merge_updated_stocks
+from FilterPipeline import FilterPipeline
+
+
+@pytest.fixture
+def schema_stocklist(stocklist) -> pd.DataFrame:
+    stock_df = stocklist
+    stock_df["Industry"] = stock_df["Sector"] + " industry"
+    stock_df["Avg Vol (3 month)"] = stock_df["Volume"] * 1000
+    return stock_df
+
+
+def test_schema_gives_compact_dtypes(schema_stocklist):
+    stock_df = apply_stocklist_schema(schema_stocklist)
+
+    for column in ["Sector", "Industry", "Direction", "Sentiment"]:
+        assert isinstance(stock_df[column].dtype, pd.CategoricalDtype)
+        assert stock_df[column].cat.categories.is_monotonic_increasing
+    assert stock_df["Volume"].dtype == "Int64"
+    assert stock_df["Avg Vol (3 month)"].dtype == "Int64"
+    assert stock_df["Symbol"].dtype == object
+
+
+def test_every_filter_gives_the_same_rows_with_the_schema(schema_stocklist, get_filters, filter_step_by_step):
+    stock_df = schema_stocklist
+    schema_stock_df = apply_stocklist_schema(stock_df.copy())
+
+    for filter in get_filters(stock_df):
+        expected = filter_step_by_step(stock_df, [filter])
+        filtered_stock_df = FilterPipeline().apply(schema_stock_df, [filter])
+        assert list(filtered_stock_df.index) == list(expected.index), filter
+
+
+def test_merge_keeps_the_schema(schema_stocklist):
+    stock_df = apply_stocklist_schema(schema_stocklist)
+    updated_stock_df = pd.DataFrame({"Symbol": ["S1", "New"], "Sector": ["Aaa", "Zzz"], "Volume": [5.4, 7.0]})
+
+    stock_df = merge_updated_stocks(stock_df, updated_stock_df)
+
+    assert list(stock_df.loc[["S1", "New"], "Sector"]) == ["Aaa", "Zzz"]
+    assert stock_df["Sector"].cat.categories.is_monotonic_increasing
+    assert list(stock_df.loc[["S1", "New"], "Volume"]) == [5, 7]
+    assert stock_df["Volume"].dtype == "Int64"
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from DataCommon import cell_contains, cell_does_not_contain, cell_string_equals, cell_string_not_equals
+from TextIndex import TextIndex
+
+
+SEARCH_STRINGS = ["bank", "BANK", "oak bank", "ba", "k", "", "xyz", "a.c", "oak$", "oak|pine"]
+
+
+@pytest.fixture
+def names() -> pd.Series:
+    # Missing values and values that aren't texts never match the index
+    return pd.Series(["Oak Bank", "pine bank", np.nan, 5, "", "OAK", "a.c", "abc", None, "Bank of Oak"])
+
+
+@pytest.mark.parametrize("categorical", [False, True])
+@pytest.mark.parametrize("filter_func", [cell_contains, cell_string_equals, cell_string_not_equals])
+def test_index_gives_the_same_rows_as_the_filter_function(names, filter_func, categorical):
+    series = names.astype(str).astype("category") if categorical else names
+    column_text_index = TextIndex().index_column(series)
+
+    for search_string in SEARCH_STRINGS:
+        expected = filter_func(series, search_string)
+        assert list(filter_func(series, search_string, column_text_index)) == list(expected), search_string
+
+
+def test_does_not_contain_never_matches_rows_without_a_text(names):
+    column_text_index = TextIndex().index_column(names)
+    has_text = names.map(lambda value: isinstance(value, str))
+
+    for search_string in filter(column_text_index.can_search, SEARCH_STRINGS):
+        does_not_contain = cell_does_not_contain(names, search_string, column_text_index)
+        # The filter function itself fails on values that aren't texts, so it is only compared on the texts
+        expected = cell_does_not_contain(names[has_text], search_string)
+        assert list(does_not_contain[has_text]) == list(expected), search_string
+        assert not does_not_contain[~has_text].any(), search_string
+
+
+def test_search_strings_with_regular_expression_characters_are_not_indexed(names):
+    column_text_index = TextIndex().index_column(names)
+
+    assert column_text_index.can_search("oak bank")
+    assert column_text_index.can_search("")
+    assert not column_text_index.can_search("a.c")
+    assert not column_text_index.can_search("oak|pine")
+    assert not column_text_index.can_search(None)
+    # "." matches any character, like in the filter function
+    assert list(cell_contains(names, "a.c", column_text_index)) == list(cell_contains(names, "a.c"))
+    assert cell_contains(names, "a.c", column_text_index)[7]
+
+
+def test_index_is_reused_for_new_versions_of_the_column(names):
+    text_index = TextIndex()
+    text_index.index_column(names)
+    num_texts = len(text_index.texts)
+
+    new_names = pd.concat([names, pd.Series(["Pine Trust"])], ignore_index=True)
+    column_text_index = text_index.index_column(new_names)
+
+    assert len(text_index.texts) == num_texts + 1
+    assert list(cell_contains(new_names, "pine", column_text_index)) == list(cell_contains(new_names, "pine"))
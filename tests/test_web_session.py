@@ -0,0 +1,69 @@
+import pytest
+import requests
+import time
+
+import WebSession as web_session_module
+from PageCache import PageCache
+from WebSession import WebSession
+
+
+class FakeResponse():
+    def __init__(self, chunks: list):
+        self.chunks = chunks
+        self.status_code = 200
+        self.ok = True
+        self.url = "http://example.com"
+        self.headers = {}
+        self.encoding = "utf-8"
+        self.chunk_sizes = []
+
+    def iter_content(self, chunk_size: int):
+        self.chunk_sizes.append(chunk_size)
+        for chunk in self.chunks:
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def web_session(tmp_path, monkeypatch):
+    # No backoff between the attempts
+    monkeypatch.setattr(web_session_module, "HTTP_BACKOFF_BASE", 0)
+    return WebSession(page_cache=PageCache(folder=tmp_path))
+
+
+def test_cut_off_body_is_retried(web_session, monkeypatch):
+    responses = [FakeResponse([b"<html>", requests.exceptions.ChunkedEncodingError("Connection broken")]),
+                 FakeResponse([b"<html>", b"</html>"])]
+    monkeypatch.setattr(web_session.session, "get", lambda url, timeout, stream: responses.pop(0))
+
+    response, content = web_session.get("http://example.com")
+
+    assert content == b"<html></html>"
+    assert response.chunk_sizes == [web_session_module.HTTP_READ_CHUNK_SIZE]
+    assert web_session.get_statistics()["retried"] == 1
+
+
+def test_page_is_decoded_and_cached(web_session, monkeypatch):
+    response = FakeResponse(["<html>Société</html>".encode("latin-1")])
+    response.encoding = "ISO-8859-1"
+    monkeypatch.setattr(web_session.session, "get", lambda url, timeout, stream: response)
+
+    assert web_session.get_page("http://example.com") == "<html>Société</html>"
+    assert web_session.page_cache.get("http://example.com") == "<html>Société</html>"
+
+
+def test_deadline_includes_waiting_for_the_headers(web_session, monkeypatch):
+    monkeypatch.setattr(web_session_module, "HTTP_REQUEST_DEADLINE", 0.05)
+    monkeypatch.setattr(web_session_module, "HTTP_MAX_RETRIES", 0)
+
+    def get_slow_headers(url, timeout, stream):
+        time.sleep(0.1)
+        return FakeResponse([b"<html></html>"])
+    monkeypatch.setattr(web_session.session, "get", get_slow_headers)
+
+    with pytest.raises(requests.exceptions.Timeout):
+        web_session.get("http://example.com")